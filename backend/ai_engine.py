@@ -1,7 +1,18 @@
-import os
-from litellm import completion
-from models import Resume, ContactInfo, EducationItem, ExperienceItem, ProjectItem, SkillCategory, CustomSection
+import asyncio
 import json
+import os
+import re
+from models import Resume
+from cache import get_cache
+from llm_client import aclosing, acomplete, astream, build_completion_kwargs, resolve_model
+from llm_tools import get_chat_tools, get_resume_response_format
+from prompts import compact_json, compact_resume_source, compact_text, trim_history
+
+# A single leading list marker: "-", "•", "*" or "1." followed by a space
+_LIST_MARKER_RE = re.compile(r"^(?:[-•*]|\d+\.)\s+")
+
+# Max concurrent section improvements per batch request (the provider-wide limit still applies)
+IMPROVE_BATCH_CONCURRENCY = int(os.getenv("IMPROVE_BATCH_CONCURRENCY", 4))
 
 # Default to a free model or allow user to set it. 
 # For now, we assume the user provides an API key in the request or env.
@@ -15,7 +26,7 @@ async def parse_resume_text(text: str, api_key: str, provider: str = "gemini", m
     You are an expert resume parser. Extract the following information from the resume text below and return it as a JSON object matching the schema.
     
     Resume Text:
-    {text}
+    {compact_resume_source(text)}
     
     Return ONLY the JSON object. No markdown formatting.
     
@@ -25,34 +36,20 @@ async def parse_resume_text(text: str, api_key: str, provider: str = "gemini", m
     - Do NOT ignore any content.
     """
     
-    model = f"gemini/{model_name}" if provider == "gemini" else "gpt-4o"
+    model = resolve_model(provider, model_name)
     
     print(f"DEBUG: Using model: {model}", flush=True)
     print(f"DEBUG: Provider: {provider}", flush=True)
-    
-    # Set API key dynamically
-    os.environ["GEMINI_API_KEY"] = api_key if provider == "gemini" else ""
-    os.environ["OPENAI_API_KEY"] = api_key if provider == "openai" else ""
-
-    # Get the schema from the Pydantic model
-    json_schema = Resume.model_json_schema()
 
-    completion_kwargs = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "response_format": {
-            "type": "json_object",
-            "response_schema": json_schema
-        }
-    }
-
-    # Add reasoning_effort for Gemini 3+ or thinking models
-    if "gemini-3" in model_name or "thinking" in model_name:
-        completion_kwargs["reasoning_effort"] = "low"
-        print("DEBUG: Added reasoning_effort='low' for Gemini 3/Thinking model", flush=True)
+    completion_kwargs = build_completion_kwargs(
+        provider,
+        model_name,
+        [{"role": "user", "content": prompt}],
+        response_format=get_resume_response_format(provider)
+    )
 
     try:
-        response = completion(**completion_kwargs)
+        response = await acomplete(provider, api_key, purpose="parse", **completion_kwargs)
     except Exception as e:
         print(f"DEBUG: LiteLLM Error: {str(e)}", flush=True)
         raise e
@@ -60,7 +57,49 @@ async def parse_resume_text(text: str, api_key: str, provider: str = "gemini", m
     content = response.choices[0].message.content
     return Resume.model_validate_json(content)
 
-async def improve_resume_section(current_content: str, job_description: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash") -> str:
+def _completion_cache_request(completion_kwargs: dict) -> str:
+    """
+    Canonical form of a completion request for the completion cache:
+    model, parameters and whitespace-normalized messages (never the API key).
+    Only whitespace is collapsed, so requests differing in content never share a key.
+    """
+    messages = [
+        {**message, "content": " ".join(message["content"].split())} if isinstance(message.get("content"), str) else message
+        for message in completion_kwargs["messages"]
+    ]
+    return json.dumps({**completion_kwargs, "messages": messages}, sort_keys=True, default=str)
+
+async def _complete_message(provider: str, api_key: str, purpose: str, completion_kwargs: dict, use_cache: bool = False) -> dict:
+    """
+    Run a completion and return the response message as a dict.
+    With `use_cache`, identical requests are answered from the completion cache
+    (TTL per purpose, see cache.COMPLETION_TTLS) and concurrent ones share one call.
+    """
+    async def complete() -> dict:
+        response = await acomplete(provider, api_key, purpose=purpose, **completion_kwargs)
+        return response.choices[0].message.model_dump()
+
+    if not use_cache:
+        return await complete()
+
+    cache = get_cache()
+    request_json = _completion_cache_request(completion_kwargs)
+    cached = await cache.get_completion(purpose, request_json)
+    if cached is not None:
+        return cached
+
+    async def complete_and_cache() -> dict:
+        message = await complete()
+        await cache.set_completion(purpose, request_json, message)
+        return message
+
+    return await cache.single_flight(
+        cache.completion_key(purpose, request_json),
+        complete_and_cache,
+        lambda: cache.get_completion(purpose, request_json)
+    )
+
+async def improve_resume_section(current_content: str, job_description: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", use_cache: bool = False) -> str:
     """
     Improves a specific resume section based on a job description.
     """
@@ -69,152 +108,105 @@ async def improve_resume_section(current_content: str, job_description: str, api
     Keep it professional, concise, and impactful. Use action verbs.
     
     Current Content:
-    {current_content}
+    {compact_text(current_content)}
     
     Job Description:
-    {job_description}
+    {compact_text(job_description)}
     
     Return ONLY the improved text.
     """
     
-    model = f"gemini/{model_name}" if provider == "gemini" else "gpt-4o"
-    
-    os.environ["GEMINI_API_KEY"] = api_key if provider == "gemini" else ""
+    completion_kwargs = build_completion_kwargs(
+        provider,
+        model_name,
+        [{"role": "user", "content": prompt}]
+    )
+
+    message = await _complete_message(provider, api_key, "improve", completion_kwargs, use_cache)
     
-    completion_kwargs = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    return message["content"]
 
-    if "gemini-3" in model_name or "thinking" in model_name:
-        completion_kwargs["reasoning_effort"] = "low"
+def _to_bullets(text: str) -> list:
+    """Split improved text back into bullet points, dropping blank lines and one leading list marker"""
+    bullets = [_LIST_MARKER_RE.sub("", line.strip()).strip() for line in text.split("\n")]
+    return [bullet for bullet in bullets if bullet]
 
-    response = completion(**completion_kwargs)
+async def improve_resume_bullets(bullets: list, job_description: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", use_cache: bool = False) -> list:
+    """
+    Improves a list of bullet points based on a job description, one bullet per line.
+    """
+    current_bullets = "\n".join(compact_text(bullet) for bullet in bullets)
+    prompt = f"""
+    You are an expert resume writer. Improve the following resume bullet points to better match the job description.
+    Keep them professional, concise, and impactful. Start each one with an action verb.
+    
+    Current Bullet Points (one per line):
+    {current_bullets}
     
-    return response.choices[0].message.content
+    Job Description:
+    {compact_text(job_description)}
+    
+    Return ONLY the improved bullet points, exactly one per line, with no blank lines, headings or other text.
+    """
+    
+    completion_kwargs = build_completion_kwargs(
+        provider,
+        model_name,
+        [{"role": "user", "content": prompt}]
+    )
+
+    message = await _complete_message(provider, api_key, "improve", completion_kwargs, use_cache)
+    
+    return _to_bullets(message["content"] or "")
 
-async def chat_with_resume(current_resume: dict, chat_history: list, user_message: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash"):
+async def improve_resume(resume: Resume, job_description: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", use_cache: bool = False) -> Resume:
     """
-    Chat with the AI about the resume. The AI can suggest updates using tools.
+    Tailors a whole resume to a job description: the summary and every experience
+    and project description are improved concurrently. Returns a patched copy.
     """
-    model = f"gemini/{model_name}" if provider == "gemini" else "gpt-4o"
-    os.environ["GEMINI_API_KEY"] = api_key if provider == "gemini" else ""
-    
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "update_contact_info",
-                "description": "Update contact information",
-                "parameters": ContactInfo.model_json_schema()
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_summary",
-                "description": "Update professional summary",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "summary": {"type": "string", "description": "The new summary text"}
-                    },
-                    "required": ["summary"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_education",
-                "description": "Update education section (replaces entire list)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "education": {
-                            "type": "array",
-                            "items": EducationItem.model_json_schema()
-                        }
-                    },
-                    "required": ["education"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_experience",
-                "description": "Update experience section (replaces entire list)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "experience": {
-                            "type": "array",
-                            "items": ExperienceItem.model_json_schema()
-                        }
-                    },
-                    "required": ["experience"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_projects",
-                "description": "Update projects section (replaces entire list)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "projects": {
-                            "type": "array",
-                            "items": ProjectItem.model_json_schema()
-                        }
-                    },
-                    "required": ["projects"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_skills",
-                "description": "Update skills section (replaces entire list)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "skills": {
-                            "type": "array",
-                            "items": SkillCategory.model_json_schema()
-                        }
-                    },
-                    "required": ["skills"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_custom_sections",
-                "description": "Update custom sections (Certifications, Awards, etc.). Replaces entire list.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "custom_sections": {
-                            "type": "array",
-                            "items": CustomSection.model_json_schema()
-                        }
-                    },
-                    "required": ["custom_sections"]
-                }
-            }
-        }
-    ]
+    improved = resume.model_copy(deep=True)
+    semaphore = asyncio.Semaphore(IMPROVE_BATCH_CONCURRENCY)
+
+    async def limited(improve):
+        async with semaphore:
+            return await improve()
+
+    # (improvement call, how to write the result back)
+    sections = []
+    if improved.summary:
+        sections.append((
+            lambda: improve_resume_section(improved.summary, job_description, api_key, provider, model_name, use_cache),
+            lambda text: setattr(improved, "summary", text.strip())
+        ))
+    for item in improved.experience + improved.projects:
+        if item.description:
+            sections.append((
+                lambda item=item: improve_resume_bullets(item.description, job_description, api_key, provider, model_name, use_cache),
+                lambda bullets, item=item: setattr(item, "description", bullets or item.description)
+            ))
 
+    tasks = [asyncio.ensure_future(limited(improve)) for improve, _ in sections]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # Stop the remaining sections if one fails or the request is cancelled
+        for task in tasks:
+            task.cancel()
+
+    for (_, apply), result in zip(sections, results):
+        apply(result)
+    print(f"DEBUG: Improved {len(sections)} resume sections", flush=True)
+    return improved
+
+def _build_chat_kwargs(current_resume: dict, chat_history: list, user_message: str, provider: str, model_name: str) -> dict:
+    """
+    Builds the completion request for a chat turn: system prompt, history and resume tools.
+    """
     system_prompt = f"""
     You are an expert resume consultant. You are helping a user improve their resume.
     
     Current Resume:
-    {json.dumps(current_resume, indent=2)}
+    {compact_json(current_resume)}
     
     You can use the provided tools to update specific sections of the resume.
     If the user asks for a change, call the appropriate tool with the NEW content.
@@ -229,21 +221,79 @@ async def chat_with_resume(current_resume: dict, chat_history: list, user_messag
     Always be helpful, professional, and concise.
     """
 
-    messages = [{"role": "system", "content": system_prompt}] + chat_history + [{"role": "user", "content": user_message}]
+    history = trim_history(chat_history, resolve_model(provider, model_name))
+    messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": user_message}]
 
-    completion_kwargs = {
-        "model": model,
-        "messages": messages,
-        "tools": tools,
-        "tool_choice": "auto"
-    }
+    return build_completion_kwargs(
+        provider,
+        model_name,
+        messages,
+        tools=get_chat_tools(provider),
+        tool_choice="auto"
+    )
 
-    if "gemini-3" in model_name or "thinking" in model_name:
-        completion_kwargs["reasoning_effort"] = "low"
+async def chat_with_resume(current_resume: dict, chat_history: list, user_message: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", use_cache: bool = False) -> dict:
+    """
+    Chat with the AI about the resume. The AI can suggest updates using tools.
+    Returns the assistant message as a dict.
+    """
+    completion_kwargs = _build_chat_kwargs(current_resume, chat_history, user_message, provider, model_name)
 
     try:
-        response = completion(**completion_kwargs)
-        return response.choices[0].message
+        return await _complete_message(provider, api_key, "chat", completion_kwargs, use_cache)
     except Exception as e:
         print(f"DEBUG: LiteLLM Error in chat: {str(e)}", flush=True)
         raise e
+
+async def stream_chat_with_resume(current_resume: dict, chat_history: list, user_message: str, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash"):
+    """
+    Streaming variant of chat_with_resume.
+    Yields events as they arrive: text tokens, incremental tool-call arguments,
+    and a final `done` event holding the assembled message.
+    """
+    completion_kwargs = _build_chat_kwargs(current_resume, chat_history, user_message, provider, model_name)
+
+    content = ""
+    tool_calls = {}
+    try:
+        async with aclosing(astream(provider, api_key, purpose="chat", **completion_kwargs)) as chunks:
+            async for chunk in chunks:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if delta.content:
+                    content += delta.content
+                    yield {"type": "token", "content": delta.content}
+
+                for tool_call in delta.tool_calls or []:
+                    call = tool_calls.setdefault(tool_call.index, {"id": None, "name": "", "arguments": ""})
+                    if tool_call.id:
+                        call["id"] = tool_call.id
+                    if tool_call.function and tool_call.function.name:
+                        call["name"] += tool_call.function.name
+                    arguments_delta = tool_call.function.arguments if tool_call.function else None
+                    if arguments_delta:
+                        call["arguments"] += arguments_delta
+                    yield {
+                        "type": "tool_call",
+                        "index": tool_call.index,
+                        "id": call["id"],
+                        "name": call["name"],
+                        "arguments_delta": arguments_delta or ""
+                    }
+    except Exception as e:
+        print(f"DEBUG: LiteLLM Error in chat stream: {str(e)}", flush=True)
+        raise e
+
+    yield {
+        "type": "done",
+        "message": {
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for _, call in sorted(tool_calls.items())
+            ] or None
+        }
+    }
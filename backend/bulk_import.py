@@ -0,0 +1,303 @@
+"""
+Bulk resume import for Adaptive-CV
+A zip or folder of PDF/TeX resumes is streamed through the same pipeline as
+/parse (parser.parse_resume_file: cache lookup, text extraction, local or LLM
+parsing, library storage) with a bounded number of files in flight. Every
+finished file is appended to a JSONL checkpoint, so an interrupted import
+resumes where it stopped.
+
+CLI: python bulk_import.py resumes.zip --api-key KEY [--provider gemini] [--model ...]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from cache import get_cache
+from library import RESUME_DIR, get_library
+from parser import parse_resume_file
+from uploads import InvalidUploadError, MAX_RESUME_UPLOAD_BYTES
+
+# Files parsed at once per import (LLM calls are further limited per provider in llm_client)
+BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", 4))
+MAX_IMPORT_FILES = int(os.getenv("MAX_IMPORT_FILES", 1000))
+MAX_IMPORT_UPLOAD_BYTES = int(os.getenv("MAX_IMPORT_UPLOAD_BYTES", 200 * 1024 * 1024))
+# Archives and checkpoints of imports started through the API
+IMPORT_DIR = os.path.join(RESUME_DIR, ".imports")
+
+IMPORT_EXTENSIONS = (".pdf", ".tex")
+
+
+class ImportInProgressError(Exception):
+    """Raised when resuming an import that is still running"""
+
+
+def _library_name(relative_path: str) -> str:
+    """Flatten a path inside the import (a/b/cv.pdf -> a_b_cv.pdf) so same-named files don't collide"""
+    parts = [part for part in relative_path.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "_".join(parts)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@contextmanager
+def _open_source(source: str):
+    """Yield (path inside the import, size, reader) for every PDF/TeX file in a zip or folder"""
+    entries: List[Tuple[str, int, Callable[[], bytes]]] = []
+    archive = None
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if info.filename.lower().endswith(IMPORT_EXTENSIONS):
+                entries.append((info.filename, info.file_size, lambda info=info: archive.read(info)))
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(IMPORT_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    entries.append((os.path.relpath(path, source), os.path.getsize(path), lambda path=path: _read_file(path)))
+    else:
+        raise InvalidUploadError(f"{source} is neither a zip archive nor a folder")
+
+    try:
+        if len(entries) > MAX_IMPORT_FILES:
+            raise InvalidUploadError(f"Import has {len(entries)} resumes; the limit is {MAX_IMPORT_FILES}")
+        yield sorted(entries, key=lambda entry: entry[0])
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+class BulkImport:
+    """One import run over a zip or folder, checkpointed to a JSONL file"""
+
+    def __init__(self, source: str, checkpoint_path: str, api_key: str, provider: str, model_name: str,
+                 concurrency: int = BULK_IMPORT_CONCURRENCY, job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.source = source
+        self.checkpoint_path = checkpoint_path
+        self.api_key = api_key
+        self.provider = provider
+        self.model_name = model_name
+        self.concurrency = max(1, concurrency)
+        self.status = "pending"
+        self.error = None
+        self.total = 0
+        self.started_at = None
+        self.finished_at = None
+        # path inside the import -> latest checkpoint record
+        self.files: Dict[str, dict] = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict[str, dict]:
+        files = {}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partial last line from an interrupted write
+                    files[record["path"]] = record
+        return files
+
+    def _checkpoint(self, record: dict):
+        self.files[record["path"]] = record
+        with open(self.checkpoint_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    async def run(self) -> dict:
+        """Import every file not already done in the checkpoint; returns the final progress"""
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            with _open_source(self.source) as entries:
+                self.total = len(entries)
+                queue = asyncio.Queue(maxsize=self.concurrency * 2)
+                workers = [asyncio.create_task(self._work(queue)) for _ in range(self.concurrency)]
+                try:
+                    await self._produce(entries, queue)
+                    for _ in workers:
+                        await queue.put(None)
+                    await asyncio.gather(*workers)
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+            self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "interrupted"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"⚠️ Import {self.job_id} failed: {e}")
+        finally:
+            self.finished_at = time.time()
+        return self.progress()
+
+    async def _produce(self, entries: list, queue: asyncio.Queue):
+        """Read files one at a time into a bounded queue, skipping checkpointed ones"""
+        for path, size, read in entries:
+            record = self.files.get(path)
+            if record and record["status"] == "done":
+                continue
+            if size > MAX_RESUME_UPLOAD_BYTES:
+                self._record(path, "failed", error=f"File is {size} bytes; the limit is {MAX_RESUME_UPLOAD_BYTES}")
+                continue
+            content = await asyncio.to_thread(read)
+            await queue.put((path, content))
+
+    async def _work(self, queue: asyncio.Queue):
+        while (item := await queue.get()) is not None:
+            path, content = item
+            sha256 = hashlib.sha256(content).hexdigest()
+            started = time.perf_counter()
+            try:
+                resume = await parse_resume_file(_library_name(path), content, sha256, self.api_key, self.provider, self.model_name)
+            except Exception as e:
+                self._record(path, "failed", sha256, time.perf_counter() - started, error=str(e))
+            else:
+                self._record(path, "done", sha256, time.perf_counter() - started, name=resume.contact.name)
+
+    def _record(self, path: str, status: str, sha256: Optional[str] = None, seconds: float = 0.0,
+                name: Optional[str] = None, error: Optional[str] = None):
+        self._checkpoint({
+            "path": path,
+            "file": _library_name(path),
+            "status": status,
+            "sha256": sha256,
+            "name": name,
+            "seconds": round(seconds, 3),
+            "error": error,
+        })
+        counts = self._counts()
+        finished = counts["done"] + counts["failed"]
+        detail = f"{error}" if error else f"{seconds:.1f}s"
+        print(f"📥 [{finished}/{self.total}] {path}: {status} ({detail})", flush=True)
+
+    def _counts(self) -> dict:
+        counts = {"done": 0, "failed": 0}
+        for record in self.files.values():
+            counts[record["status"]] += 1
+        return counts
+
+    def progress(self) -> dict:
+        """Current state, counts and per-file records"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            **self._counts(),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files": sorted(self.files.values(), key=lambda record: record["path"]),
+        }
+
+
+class ImportManager:
+    """Imports started through the API; archives and checkpoints live in IMPORT_DIR"""
+
+    def __init__(self, import_dir: str = IMPORT_DIR):
+        self.import_dir = import_dir
+        self._imports: Dict[str, BulkImport] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def archive_path(self, job_id: str) -> str:
+        return os.path.join(self.import_dir, f"{job_id}.zip")
+
+    def checkpoint_path(self, job_id: str) -> str:
+        return os.path.join(self.import_dir, f"{job_id}.jsonl")
+
+    async def start(self, archive, api_key: str, provider: str, model_name: str) -> dict:
+        """Copy a spooled zip upload into IMPORT_DIR and import it in the background"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.import_dir, exist_ok=True)
+
+        def save():
+            archive.seek(0)
+            with open(self.archive_path(job_id), "wb") as f:
+                shutil.copyfileobj(archive, f)
+        await asyncio.to_thread(save)
+        if not zipfile.is_zipfile(self.archive_path(job_id)):
+            os.remove(self.archive_path(job_id))
+            raise InvalidUploadError("Upload is not a zip archive")
+
+        return self._launch(BulkImport(self.archive_path(job_id), self.checkpoint_path(job_id), api_key, provider, model_name, job_id=job_id))
+
+    def resume(self, job_id: str, api_key: str, provider: str, model_name: str) -> Optional[dict]:
+        """Restart an interrupted or failed import; files done in the checkpoint are skipped"""
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            raise ImportInProgressError(f"Import {job_id} is still running")
+        if not job_id.isalnum() or not os.path.exists(self.archive_path(job_id)):
+            return None
+        return self._launch(BulkImport(self.archive_path(job_id), self.checkpoint_path(job_id), api_key, provider, model_name, job_id=job_id))
+
+    def _launch(self, bulk_import: BulkImport) -> dict:
+        self._imports[bulk_import.job_id] = bulk_import
+        self._tasks[bulk_import.job_id] = asyncio.create_task(bulk_import.run())
+        bulk_import.status = "running"
+        return bulk_import.progress()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Progress of an import, from memory or (after a restart) from its checkpoint"""
+        bulk_import = self._imports.get(job_id)
+        if bulk_import is None:
+            if not job_id.isalnum() or not os.path.exists(self.archive_path(job_id)):
+                return None
+            bulk_import = BulkImport(self.archive_path(job_id), self.checkpoint_path(job_id), "", "", "", job_id=job_id)
+            bulk_import.status = "interrupted"
+        return bulk_import.progress()
+
+    async def stop(self):
+        """Cancel running imports; their checkpoints let them be resumed later"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+
+
+# Global import manager instance
+_import_manager: Optional[ImportManager] = None
+
+
+def get_import_manager() -> ImportManager:
+    """Get the global import manager instance"""
+    global _import_manager
+    if _import_manager is None:
+        _import_manager = ImportManager()
+    return _import_manager
+
+
+async def _main(args):
+    await get_cache().connect()
+    try:
+        bulk_import = BulkImport(args.source, args.checkpoint or f"{args.source.rstrip('/')}.import.jsonl",
+                                 args.api_key, args.provider, args.model, args.concurrency)
+        progress = await bulk_import.run()
+        print(f"✅ Imported {progress['done']}/{progress['total']} resumes ({progress['failed']} failed); checkpoint: {bulk_import.checkpoint_path}")
+    finally:
+        get_library().close()
+        await get_cache().close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Import a zip or folder of PDF/TeX resumes into the library")
+    arg_parser.add_argument("source", help="Zip archive or folder")
+    arg_parser.add_argument("--api-key", default=os.getenv("LLM_API_KEY", ""), help="LLM API key (default: $LLM_API_KEY)")
+    arg_parser.add_argument("--provider", default="gemini")
+    arg_parser.add_argument("--model", default="gemini-1.5-flash")
+    arg_parser.add_argument("--concurrency", type=int, default=BULK_IMPORT_CONCURRENCY)
+    arg_parser.add_argument("--checkpoint", help="Checkpoint file (default: <source>.import.jsonl); rerun with the same one to resume")
+    asyncio.run(_main(arg_parser.parse_args()))
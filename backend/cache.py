@@ -1,12 +1,19 @@
 """
 Redis caching utility for Adaptive-CV
-Provides caching for parsed resumes and generated PDFs
+Provides caching for parsed resumes and generated PDFs, with an in-process
+LRU tier in front of Redis
 """
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
+import uuid
 import hashlib
 import os
-from typing import Optional, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Any, Awaitable, Callable, Dict
 from functools import wraps
 
 # Redis Configuration
@@ -14,167 +21,571 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2))
+
+# Reconnection backoff (in seconds) while the circuit breaker is open
+RECONNECT_BACKOFF_INITIAL = 0.5
+RECONNECT_BACKOFF_MAX = 30
 
 # Cache TTLs (in seconds)
 PARSED_RESUME_TTL = 3600 * 24  # 24 hours
 GENERATED_PDF_TTL = 3600 * 6   # 6 hours
 SESSION_TTL = 3600 * 2         # 2 hours
+RENDER_JOB_TTL = 3600          # 1 hour, job state and result PDF
+INFLIGHT_TTL = 180             # 3 minutes, lifetime of a cross-worker in-flight marker
+
+# LLM completion cache TTLs per endpoint (in seconds, 0 disables)
+COMPLETION_TTLS = {
+    "improve": int(os.getenv("IMPROVE_CACHE_TTL", 3600 * 24 * 7)),  # 7 days
+    "chat": int(os.getenv("CHAT_CACHE_TTL", 3600)),                # 1 hour
+}
+
+# How often a worker polls for another worker's in-flight result (in seconds)
+INFLIGHT_POLL_INTERVAL = 0.25
+
+# Keyspace scanning: entry counts are refreshed in the background at most this often (in seconds)
+STATS_REFRESH_INTERVAL = 60
+SCAN_BATCH_SIZE = 1000
+UNLINK_BATCH_SIZE = 500
+KEY_PATTERN = "adaptive_cv:*"
+# Namespaces that hold recomputable results; clear_all leaves sessions, render
+# jobs and in-flight markers alone
+CLEARABLE_KEY_PREFIXES = ("adaptive_cv:parsed:", "adaptive_cv:parsed_text:", "adaptive_cv:pdf:", "adaptive_cv:completion:")
+STATS_KEY = "adaptive_cv:stats"
+
+# In-process cache size (in bytes)
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class LocalLRUCache:
+    """Size-bounded in-process LRU cache with per-entry TTLs"""
+
+    def __init__(self, max_bytes: int = LOCAL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a value, refreshing its recency. Expired entries are dropped."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        """Store a value, evicting least recently used entries to stay within budget"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+    def delete(self, key: str):
+        """Remove a single entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self, prefixes: Optional[tuple] = None) -> int:
+        """Remove all entries (or those whose key starts with one of `prefixes`), returning how many were dropped"""
+        with self._lock:
+            if prefixes is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._size = 0
+                return count
+            keys = [key for key in self._entries if key.startswith(prefixes)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+    def get_stats(self) -> dict:
+        """Get in-process cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+class _Flight:
+    """A shared in-flight computation and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+# Delete a marker only if it still holds our token
+_RELEASE_MARKER_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
 
 class RedisCache:
-    """Redis cache wrapper with fallback for when Redis is unavailable"""
+    """Two-tier cache: in-process LRU in front of an asyncio Redis client, still serving local hits when Redis is unavailable"""
     
     def __init__(self):
-        self._client: Optional[redis.Redis] = None
+        self._pool = aioredis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=False,  # We'll handle encoding ourselves
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            max_connections=REDIS_MAX_CONNECTIONS
+        )
+        self._client: aioredis.Redis = aioredis.Redis(connection_pool=self._pool)
         self._available = False
-        self._connect()
+        self._local = LocalLRUCache()
+        self._inflight: Dict[str, "_Flight"] = {}
+        self._hits = 0
+        self._misses = 0
+        self._entry_count: Optional[int] = None
+        self._entry_count_at = 0.0
+        self._entry_count_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._reconnect_attempts = 0
+        self._circuit_trips = 0
     
-    def _connect(self):
-        """Attempt to connect to Redis"""
+    async def connect(self):
+        """Attempt to connect to Redis, retrying in the background if it is unreachable"""
         try:
-            self._client = redis.Redis(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                db=REDIS_DB,
-                password=REDIS_PASSWORD,
-                decode_responses=False,  # We'll handle encoding ourselves
-                socket_connect_timeout=2,
-                socket_timeout=2
-            )
             # Test connection
-            self._client.ping()
+            await self._client.ping()
             self._available = True
             print(f"✅ Redis connected at {REDIS_HOST}:{REDIS_PORT}")
         except (redis.ConnectionError, redis.TimeoutError) as e:
             self._available = False
-            print(f"⚠️ Redis unavailable ({e}). Running without cache.")
+            print(f"⚠️ Redis unavailable ({e}). Running with in-process cache only.")
+            self._start_reconnect()
+    
+    async def close(self):
+        """Stop reconnecting and release pooled Redis connections"""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        await self._client.aclose()
+    
+    # ========== CIRCUIT BREAKER ==========
+    
+    def _handle_error(self, operation: str, e: Exception):
+        """Log a Redis error; connection failures open the circuit so later calls skip Redis immediately"""
+        print(f"{operation} error: {e}")
+        if isinstance(e, (redis.ConnectionError, redis.TimeoutError)) and self._available:
+            self._available = False
+            self._circuit_trips += 1
+            print("⚠️ Redis circuit open. Serving from in-process cache until it recovers.")
+            self._start_reconnect()
+    
+    def _start_reconnect(self):
+        """Start the background reconnection loop if it is not already running"""
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+    
+    async def _reconnect_loop(self):
+        """Probe Redis with exponential backoff and close the circuit once it answers"""
+        delay = RECONNECT_BACKOFF_INITIAL
+        self._reconnect_attempts = 0
+        while not self._available:
+            await asyncio.sleep(delay)
+            self._reconnect_attempts += 1
+            try:
+                await self._client.ping()
+            except (redis.ConnectionError, redis.TimeoutError):
+                delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+                continue
+            self._available = True
+            print(f"✅ Redis reconnected at {REDIS_HOST}:{REDIS_PORT} after {self._reconnect_attempts} attempt(s)")
     
     @property
     def is_available(self) -> bool:
         """Check if Redis is available"""
         return self._available
     
-    def _generate_key(self, prefix: str, data: bytes) -> str:
-        """Generate a cache key from content hash"""
-        content_hash = hashlib.sha256(data).hexdigest()[:16]
+    def _generate_key(self, prefix: str, data: Optional[bytes] = None, digest: Optional[str] = None) -> str:
+        """Generate a cache key from content hash (or a SHA-256 hex digest computed elsewhere)"""
+        content_hash = (digest or hashlib.sha256(data).hexdigest())[:16]
         return f"adaptive_cv:{prefix}:{content_hash}"
     
-    # ========== PARSED RESUME CACHING ==========
+    def parsed_resume_key(self, file_digest: str, provider: str, model: str) -> str:
+        """Cache key for a parsed resume, from the upload's SHA-256 hex digest"""
+        return self._generate_key(f"parsed:{provider}:{model}", digest=file_digest)
     
-    def get_parsed_resume(self, file_content: bytes, provider: str, model: str) -> Optional[dict]:
-        """Get cached parsed resume data"""
-        if not self._available:
-            return None
+    def parsed_text_key(self, normalized_text: str, provider: str, model: str) -> str:
+        """Cache key for a parsed resume, based on normalized extracted text"""
+        return self._generate_key(f"parsed_text:{provider}:{model}", normalized_text.encode('utf-8'))
+    
+    def pdf_key(self, resume_json: str) -> str:
+        """Cache key for a generated PDF"""
+        return self._generate_key("pdf", resume_json.encode('utf-8'))
+    
+    def completion_key(self, purpose: str, request_json: str) -> str:
+        """Cache key for an LLM completion, based on the canonical request"""
+        return self._generate_key(f"completion:{purpose}", request_json.encode('utf-8'))
+    
+    async def _get(self, key: str, ttl: int) -> Optional[bytes]:
+        """Look up a key in the local tier, then Redis, backfilling the local tier on a Redis hit"""
+        data = self._local.get(key)
+        if data is not None or not self._available:
+            return data
         
         try:
-            key = self._generate_key(f"parsed:{provider}:{model}", file_content)
-            data = self._client.get(key)
-            if data:
-                print(f"🎯 Cache HIT for parsed resume")
-                return json.loads(data.decode('utf-8'))
+            # Fetch the value and its remaining lifetime in one round trip
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                data, remaining_ms = await pipe.execute()
+            if data is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            local_ttl = remaining_ms / 1000 if remaining_ms and remaining_ms > 0 else ttl
+            self._local.set(key, data, local_ttl)
+            return data
         except Exception as e:
-            print(f"Cache get error: {e}")
+            self._handle_error("Cache get", e)
         return None
     
-    def set_parsed_resume(self, file_content: bytes, provider: str, model: str, resume_data: dict):
-        """Cache parsed resume data"""
+    async def _set(self, key: str, data: bytes, ttl: int):
+        """Write a key to both tiers"""
+        self._local.set(key, data, ttl)
         if not self._available:
             return
         
         try:
-            key = self._generate_key(f"parsed:{provider}:{model}", file_content)
-            self._client.setex(key, PARSED_RESUME_TTL, json.dumps(resume_data).encode('utf-8'))
-            print(f"💾 Cached parsed resume (TTL: {PARSED_RESUME_TTL}s)")
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, data)
+                pipe.hincrby(STATS_KEY, "sets", 1)
+                await pipe.execute()
         except Exception as e:
-            print(f"Cache set error: {e}")
+            self._handle_error("Cache set", e)
+    
+    # ========== PARSED RESUME CACHING ==========
+    
+    async def get_parsed_resume(self, file_digest: str, provider: str, model: str) -> Optional[dict]:
+        """Get cached parsed resume data by the upload's SHA-256 hex digest"""
+        key = self.parsed_resume_key(file_digest, provider, model)
+        data = await self._get(key, PARSED_RESUME_TTL)
+        if data:
+            print(f"🎯 Cache HIT for parsed resume")
+            return json.loads(data.decode('utf-8'))
+        return None
+    
+    async def set_parsed_resume(self, file_digest: str, provider: str, model: str, resume_data: dict):
+        """Cache parsed resume data by the upload's SHA-256 hex digest"""
+        key = self.parsed_resume_key(file_digest, provider, model)
+        await self._set(key, json.dumps(resume_data).encode('utf-8'), PARSED_RESUME_TTL)
+        print(f"💾 Cached parsed resume (TTL: {PARSED_RESUME_TTL}s)")
+    
+    async def get_parsed_resume_by_text(self, normalized_text: str, provider: str, model: str) -> Optional[dict]:
+        """Get cached parsed resume data by normalized content, ignoring file bytes"""
+        key = self.parsed_text_key(normalized_text, provider, model)
+        data = await self._get(key, PARSED_RESUME_TTL)
+        if data:
+            print(f"🎯 Cache HIT for parsed resume (content match)")
+            return json.loads(data.decode('utf-8'))
+        return None
+    
+    async def set_parsed_resume_by_text(self, normalized_text: str, provider: str, model: str, resume_data: dict):
+        """Cache parsed resume data by normalized content"""
+        key = self.parsed_text_key(normalized_text, provider, model)
+        await self._set(key, json.dumps(resume_data).encode('utf-8'), PARSED_RESUME_TTL)
     
     # ========== GENERATED PDF CACHING ==========
     
-    def get_generated_pdf(self, resume_json: str) -> Optional[bytes]:
+    async def get_generated_pdf(self, resume_json: str) -> Optional[bytes]:
         """Get cached generated PDF"""
-        if not self._available:
+        key = self.pdf_key(resume_json)
+        data = await self._get(key, GENERATED_PDF_TTL)
+        if data:
+            print(f"🎯 Cache HIT for generated PDF")
+            return data
+        return None
+    
+    async def set_generated_pdf(self, resume_json: str, pdf_content: bytes):
+        """Cache generated PDF"""
+        key = self.pdf_key(resume_json)
+        await self._set(key, pdf_content, GENERATED_PDF_TTL)
+        print(f"💾 Cached generated PDF (TTL: {GENERATED_PDF_TTL}s)")
+    
+    # ========== LLM COMPLETION CACHING ==========
+    
+    async def get_completion(self, purpose: str, request_json: str) -> Optional[dict]:
+        """Get a cached completion message"""
+        ttl = COMPLETION_TTLS.get(purpose, 0)
+        if ttl <= 0:
             return None
+        data = await self._get(self.completion_key(purpose, request_json), ttl)
+        if data:
+            print(f"🎯 Cache HIT for {purpose} completion")
+            return json.loads(data.decode('utf-8'))
+        return None
+    
+    async def set_completion(self, purpose: str, request_json: str, message: dict):
+        """Cache a completion message"""
+        ttl = COMPLETION_TTLS.get(purpose, 0)
+        if ttl <= 0:
+            return
+        await self._set(self.completion_key(purpose, request_json), json.dumps(message).encode('utf-8'), ttl)
+        print(f"💾 Cached {purpose} completion (TTL: {ttl}s)")
+    
+    # ========== SHARED STATE ==========
+    
+    async def _get_shared(self, key: str, ttl: int, operation: str) -> Optional[dict]:
+        """
+        Get mutable JSON state.
+        It changes between requests, so Redis (shared by all workers) is read first;
+        the local tier only answers while Redis is unavailable.
+        """
+        if self._available:
+            try:
+                data = await self._client.get(key)
+                if data:
+                    self._local.set(key, data, ttl)
+                    return json.loads(data.decode('utf-8'))
+                return None
+            except Exception as e:
+                self._handle_error(f"{operation} get", e)
         
-        try:
-            key = self._generate_key("pdf", resume_json.encode('utf-8'))
-            data = self._client.get(key)
-            if data:
-                print(f"🎯 Cache HIT for generated PDF")
-                return data
-        except Exception as e:
-            print(f"Cache get error: {e}")
+        data = self._local.get(key)
+        if data:
+            return json.loads(data.decode('utf-8'))
         return None
     
-    def set_generated_pdf(self, resume_json: str, pdf_content: bytes):
-        """Cache generated PDF"""
+    async def _set_shared(self, key: str, data: dict, ttl: int, operation: str):
+        """Store mutable JSON state in both tiers"""
+        payload = json.dumps(data).encode('utf-8')
+        self._local.set(key, payload, ttl)
         if not self._available:
             return
         
         try:
-            key = self._generate_key("pdf", resume_json.encode('utf-8'))
-            self._client.setex(key, GENERATED_PDF_TTL, pdf_content)
-            print(f"💾 Cached generated PDF (TTL: {GENERATED_PDF_TTL}s)")
+            await self._client.setex(key, ttl, payload)
         except Exception as e:
-            print(f"Cache set error: {e}")
+            self._handle_error(f"{operation} set", e)
     
     # ========== SESSION DATA ==========
     
-    def get_session(self, session_id: str) -> Optional[dict]:
+    async def get_session(self, session_id: str) -> Optional[dict]:
         """Get session data"""
+        return await self._get_shared(f"adaptive_cv:session:{session_id}", SESSION_TTL, "Session")
+    
+    async def set_session(self, session_id: str, data: dict):
+        """Store session data"""
+        await self._set_shared(f"adaptive_cv:session:{session_id}", data, SESSION_TTL, "Session")
+    
+    # ========== RENDER JOBS ==========
+    
+    async def get_render_job(self, job_id: str) -> Optional[dict]:
+        """Get a render job's state"""
+        return await self._get_shared(f"adaptive_cv:render_job:{job_id}", RENDER_JOB_TTL, "Render job")
+    
+    async def set_render_job(self, job_id: str, job: dict):
+        """Store a render job's state"""
+        await self._set_shared(f"adaptive_cv:render_job:{job_id}", job, RENDER_JOB_TTL, "Render job")
+    
+    async def get_render_job_pdf(self, job_id: str) -> Optional[bytes]:
+        """Get the PDF produced by a finished render job"""
+        return await self._get(f"adaptive_cv:render_job_pdf:{job_id}", RENDER_JOB_TTL)
+    
+    async def set_render_job_pdf(self, job_id: str, pdf_content: bytes):
+        """Store the PDF produced by a render job"""
+        await self._set(f"adaptive_cv:render_job_pdf:{job_id}", pdf_content, RENDER_JOB_TTL)
+    
+    # ========== REQUEST COALESCING ==========
+    
+    async def single_flight(self, key: str, compute: Callable[[], Awaitable[Any]], lookup: Callable[[], Awaitable[Optional[Any]]]) -> Any:
+        """
+        Run `compute` once for concurrent callers sharing `key`.
+        Callers in this process await the same task; other workers see a short-lived
+        Redis marker and poll `lookup` (a cache read) for the result instead of recomputing.
+        `compute` is expected to populate the cache before returning.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._run_flight(key, compute, lookup)))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            print(f"🔗 Coalesced with in-flight request {key}")
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # Only abandon the shared work once nobody is waiting for it
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+    
+    async def _run_flight(self, key: str, compute: Callable[[], Awaitable[Any]], lookup: Callable[[], Awaitable[Optional[Any]]]) -> Any:
+        """Compute a result, or wait for another worker that already owns the key"""
+        marker_key = f"adaptive_cv:inflight:{key}"
+        token = uuid.uuid4().hex
+        if await self._acquire_marker(marker_key, token):
+            try:
+                return await compute()
+            finally:
+                await self._release_marker(marker_key, token)
+        
+        print(f"⏳ Waiting for another worker to finish {key}")
+        deadline = time.monotonic() + INFLIGHT_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(INFLIGHT_POLL_INTERVAL)
+            result = await lookup()
+            if result is not None:
+                return result
+            if not await self._marker_exists(marker_key):
+                break
+        
+        # The other worker failed or vanished; do the work ourselves
+        return await compute()
+    
+    async def _acquire_marker(self, marker_key: str, token: str) -> bool:
+        """Claim a cross-worker in-flight marker; always succeeds without Redis"""
         if not self._available:
-            return None
+            return True
         
         try:
-            key = f"adaptive_cv:session:{session_id}"
-            data = self._client.get(key)
-            if data:
-                return json.loads(data.decode('utf-8'))
+            return bool(await self._client.set(marker_key, token, nx=True, ex=INFLIGHT_TTL))
         except Exception as e:
-            print(f"Session get error: {e}")
-        return None
+            self._handle_error("In-flight marker", e)
+            return True
     
-    def set_session(self, session_id: str, data: dict):
-        """Store session data"""
+    async def _release_marker(self, marker_key: str, token: str):
+        """Release a marker only if this worker still owns it"""
         if not self._available:
             return
         
         try:
-            key = f"adaptive_cv:session:{session_id}"
-            self._client.setex(key, SESSION_TTL, json.dumps(data).encode('utf-8'))
+            await self._client.eval(_RELEASE_MARKER_SCRIPT, 1, marker_key, token)
+        except Exception as e:
+            self._handle_error("In-flight marker", e)
+    
+    async def _marker_exists(self, marker_key: str) -> bool:
+        """Check whether another worker still holds a marker"""
+        if not self._available:
+            return False
+        
+        try:
+            return bool(await self._client.exists(marker_key))
         except Exception as e:
-            print(f"Session set error: {e}")
+            self._handle_error("In-flight marker", e)
+            return False
     
     # ========== CACHE MANAGEMENT ==========
     
-    def clear_all(self):
-        """Clear all Adaptive-CV cache entries"""
+    async def clear_all(self):
+        """
+        Clear cached parses, PDFs and completions using SCAN and batched UNLINK.
+        Sessions, render jobs and in-flight markers are state, not cache, and are kept.
+        """
+        self._local.clear(CLEARABLE_KEY_PREFIXES)
         if not self._available:
             return
         
         try:
-            keys = self._client.keys("adaptive_cv:*")
-            if keys:
-                self._client.delete(*keys)
-                print(f"🗑️ Cleared {len(keys)} cache entries")
+            cleared = 0
+            batch = []
+            for prefix in CLEARABLE_KEY_PREFIXES:
+                async for key in self._client.scan_iter(match=f"{prefix}*", count=SCAN_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= UNLINK_BATCH_SIZE:
+                        cleared += await self._client.unlink(*batch)
+                        batch = []
+            if batch:
+                cleared += await self._client.unlink(*batch)
+            # Refresh the entry count on the next get_stats
+            self._entry_count_at = 0.0
+            print(f"🗑️ Cleared {cleared} cache entries")
         except Exception as e:
-            print(f"Cache clear error: {e}")
+            self._handle_error("Cache clear", e)
     
-    def get_stats(self) -> dict:
-        """Get cache statistics"""
+    async def _refresh_entry_count(self):
+        """Count Adaptive-CV keys with an incremental SCAN (never KEYS)"""
+        try:
+            count = 0
+            async for _ in self._client.scan_iter(match=KEY_PATTERN, count=SCAN_BATCH_SIZE):
+                count += 1
+            self._entry_count = count
+            self._entry_count_at = time.monotonic()
+        except Exception as e:
+            self._handle_error("Cache scan", e)
+    
+    async def get_stats(self) -> dict:
+        """
+        Get cache statistics.
+        The entry count comes from a background SCAN refreshed at most every
+        STATS_REFRESH_INTERVAL seconds, so polling this stays O(1).
+        """
+        local_stats = self._local.get_stats()
+        circuit = {
+            "state": "closed" if self._available else "open",
+            "trips": self._circuit_trips,
+            "reconnect_attempts": self._reconnect_attempts
+        }
         if not self._available:
-            return {"available": False}
+            return {"available": False, "circuit": circuit, "local": local_stats}
+        
+        stale = time.monotonic() - self._entry_count_at > STATS_REFRESH_INTERVAL
+        if stale and (self._entry_count_task is None or self._entry_count_task.done()):
+            self._entry_count_task = asyncio.create_task(self._refresh_entry_count())
         
         try:
-            info = self._client.info()
-            keys = self._client.keys("adaptive_cv:*")
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.info()
+                pipe.hgetall(STATS_KEY)
+                info, counters = await pipe.execute()
             return {
                 "available": True,
                 "connected_clients": info.get("connected_clients", 0),
                 "used_memory_human": info.get("used_memory_human", "N/A"),
-                "cache_entries": len(keys),
-                "uptime_seconds": info.get("uptime_in_seconds", 0)
+                "cache_entries": self._entry_count,
+                "cache_entries_age_seconds": round(time.monotonic() - self._entry_count_at) if self._entry_count is not None else None,
+                "total_sets": int(counters.get(b"sets", 0)),
+                "hits": self._hits,
+                "misses": self._misses,
+                "uptime_seconds": info.get("uptime_in_seconds", 0),
+                "circuit": circuit,
+                "local": local_stats
             }
         except Exception as e:
-            return {"available": False, "error": str(e)}
+            self._handle_error("Cache stats", e)
+            return {"available": False, "error": str(e), "circuit": circuit, "local": local_stats}
 
 
 # Global cache instance
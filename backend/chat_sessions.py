@@ -0,0 +1,110 @@
+"""
+Server-side chat sessions for Adaptive-CV
+The server keeps the resume and chat history per session, so each turn only
+carries the new message plus compact resume diffs in both directions
+"""
+import json
+import uuid
+from typing import Optional, Tuple
+from models import Resume
+from cache import get_cache
+from llm_tools import get_tool_target
+
+# Older turns beyond this are dropped from the stored history
+CHAT_SESSION_MAX_MESSAGES = 40
+
+
+class SessionNotFound(Exception):
+    """Raised when a chat session does not exist or has expired"""
+
+
+async def create_session(resume: dict) -> str:
+    """Start a session holding the client's current resume"""
+    session_id = uuid.uuid4().hex
+    await get_cache().set_session(session_id, {"resume": resume, "history": []})
+    return session_id
+
+
+async def load_session(session_id: str) -> dict:
+    """Load a session or raise SessionNotFound"""
+    session = await get_cache().get_session(session_id)
+    if session is None:
+        raise SessionNotFound(f"Chat session {session_id} not found or expired")
+    return session
+
+
+def apply_patch(resume: dict, patch: Optional[dict]) -> dict:
+    """Apply a client-side resume diff (top-level section -> new value) and validate the result"""
+    if not patch:
+        return resume
+    unknown = set(patch) - set(Resume.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown resume sections in patch: {', '.join(sorted(unknown))}")
+    patched = {**resume, **patch}
+    Resume.model_validate(patched)
+    return patched
+
+
+def message_to_dict(message) -> dict:
+    """Normalize an LLM message (litellm object or dict) to a plain dict"""
+    if not isinstance(message, dict):
+        message = message.model_dump()
+    return message
+
+
+def apply_tool_calls(resume: dict, message: dict) -> Tuple[dict, dict]:
+    """
+    Apply the assistant's resume tool calls to the session resume.
+    Returns the updated resume and the diff of sections that changed.
+    """
+    diff = {}
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function") or {}
+        target = get_tool_target(function.get("name"))
+        if target is None:
+            continue
+        try:
+            arguments = json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            print(f"DEBUG: Skipping tool call with invalid arguments: {function.get('name')}", flush=True)
+            continue
+        field, argument = target
+        if argument is None:
+            # Whole-object tools (contact) are partial updates, merged like the frontend does
+            current = diff.get(field, resume.get(field))
+            diff[field] = {**current, **arguments} if isinstance(current, dict) else arguments
+        else:
+            diff[field] = arguments.get(argument)
+
+    if not diff:
+        return resume, diff
+    try:
+        return apply_patch(resume, diff), diff
+    except ValueError as e:
+        print(f"DEBUG: Discarding invalid tool call result: {e}", flush=True)
+        return resume, {}
+
+
+def _history_entry(message: dict, diff: dict) -> dict:
+    """
+    Compact form of an assistant turn for the stored history.
+    Tool call payloads are not kept: their effect already lives in the session resume.
+    """
+    content = message.get("content") or ""
+    if diff:
+        note = f"[Updated: {', '.join(diff)}]"
+        content = f"{content}\n{note}" if content else note
+    return {"role": "assistant", "content": content}
+
+
+async def record_turn(session_id: str, session: dict, user_message: str, message) -> dict:
+    """Store the turn in the session and return the resume diff it produced"""
+    message = message_to_dict(message)
+    resume, diff = apply_tool_calls(session["resume"], message)
+    history = session["history"] + [
+        {"role": "user", "content": user_message},
+        _history_entry(message, diff),
+    ]
+    session = {"resume": resume, "history": history[-CHAT_SESSION_MAX_MESSAGES:]}
+    await get_cache().set_session(session_id, session)
+    return diff
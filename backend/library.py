@@ -0,0 +1,405 @@
+"""
+Resume library for Adaptive-CV
+Content-addressed storage under RESUME_DIR: every distinct file is stored once
+in blobs/ under its SHA-256, and user-visible names (e.g. "v2.json") are
+pointers in a SQLite index holding size, mtime, contact name, section counts
+and the version history of each name
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+RESUME_DIR = os.getenv("RESUME_DIR", "resumes")
+LIBRARY_DB_PATH = os.getenv("LIBRARY_DB_PATH", os.path.join(RESUME_DIR, ".library.sqlite3"))
+BLOB_DIR = os.path.join(RESUME_DIR, "blobs")
+
+# File types kept in the library
+LIBRARY_EXTENSIONS = (".json", ".pdf", ".tex")
+# Kinds listed when no kind is asked for: the ones the file explorer can open
+DEFAULT_LIST_KINDS = ("json", "pdf")
+SORT_COLUMNS = {"name", "mtime", "size", "contact_name"}
+MAX_PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resumes (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    contact_name TEXT,
+    education_count INTEGER,
+    experience_count INTEGER,
+    project_count INTEGER,
+    skill_count INTEGER,
+    custom_section_count INTEGER,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS resumes_mtime ON resumes (mtime);
+CREATE INDEX IF NOT EXISTS resumes_size ON resumes (size);
+CREATE INDEX IF NOT EXISTS resumes_contact_name ON resumes (contact_name);
+CREATE INDEX IF NOT EXISTS resumes_content_hash ON resumes (content_hash);
+
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (name, version)
+);
+CREATE INDEX IF NOT EXISTS versions_content_hash ON versions (content_hash);
+
+-- Loose files in RESUME_DIR already imported, so restarts don't import them again
+CREATE TABLE IF NOT EXISTS loose_files (
+    name TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+);
+
+-- Resume JSON hash -> hash of the PDF rendered from it, and the templates used
+CREATE TABLE IF NOT EXISTS renders (
+    source_hash TEXT PRIMARY KEY,
+    pdf_hash TEXT NOT NULL,
+    template_hash TEXT NOT NULL DEFAULT ''
+);
+"""
+
+_COLUMNS = [
+    "name", "kind", "size", "mtime", "content_hash", "contact_name",
+    "education_count", "experience_count", "project_count", "skill_count", "custom_section_count",
+    "version",
+]
+_METADATA_COLUMNS = _COLUMNS[5:11]
+
+
+def content_hash(content: bytes) -> str:
+    """Address of a blob"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def canonical_json(data) -> bytes:
+    """Stable serialization, so equal resumes share one blob"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _resume_metadata(resume: Optional[dict]) -> dict:
+    """Contact name and section counts of a resume dict (all None when unknown)"""
+    if not isinstance(resume, dict):
+        return dict.fromkeys(_METADATA_COLUMNS)
+    contact = resume.get("contact") or {}
+    return {
+        "contact_name": contact.get("name"),
+        "education_count": len(resume.get("education") or []),
+        "experience_count": len(resume.get("experience") or []),
+        "project_count": len(resume.get("projects") or []),
+        "skill_count": len(resume.get("skills") or []),
+        "custom_section_count": len(resume.get("custom_sections") or []),
+    }
+
+
+def _sibling(name: str) -> str:
+    """The .pdf for a .json and vice versa"""
+    base, ext = os.path.splitext(name)
+    return base + (".pdf" if ext == ".json" else ".json")
+
+
+class ResumeLibrary:
+    """Blob store plus SQLite pointer index; blocking work runs in a worker thread"""
+
+    def __init__(self, resume_dir: str = RESUME_DIR, db_path: str = LIBRARY_DB_PATH, blob_dir: str = BLOB_DIR):
+        self.resume_dir = resume_dir
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(resumes)")}
+            if columns and "version" not in columns:
+                # Index created before version history existed
+                self._conn.execute("ALTER TABLE resumes ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            render_columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(renders)")}
+            if render_columns and "template_hash" not in render_columns:
+                # Renders recorded before template changes were tracked never match again
+                self._conn.execute("ALTER TABLE renders ADD COLUMN template_hash TEXT NOT NULL DEFAULT ''")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _run(self, fn, *args):
+        """Run fn(conn, *args) in a worker thread as one transaction"""
+        def locked():
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    return fn(conn, *args)
+        return asyncio.to_thread(locked)
+
+    # ========== BLOBS ==========
+
+    def blob_path(self, blob_hash: str) -> str:
+        """Path of a blob (fanned out by hash prefix)"""
+        return os.path.join(self.blob_dir, blob_hash[:2], blob_hash)
+
+    def _write_blob(self, content: bytes, blob_hash: Optional[str] = None) -> str:
+        """Store content once; a blob that already exists is not rewritten"""
+        blob_hash = blob_hash or content_hash(content)
+        path = self.blob_path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return blob_hash
+
+    def _collect_garbage(self, conn: sqlite3.Connection, blob_hashes):
+        """Delete blobs no pointer, version or render still references"""
+        for blob_hash in set(blob_hashes):
+            referenced = conn.execute(
+                "SELECT 1 FROM resumes WHERE content_hash = ? UNION ALL SELECT 1 FROM versions WHERE content_hash = ? LIMIT 1",
+                (blob_hash, blob_hash),
+            ).fetchone()
+            if referenced is None:
+                conn.execute("DELETE FROM renders WHERE source_hash = ? OR pdf_hash = ?", (blob_hash, blob_hash))
+                try:
+                    os.remove(self.blob_path(blob_hash))
+                except FileNotFoundError:
+                    pass
+
+    # ========== WRITES ==========
+
+    @staticmethod
+    def _point(conn: sqlite3.Connection, name: str, blob_hash: str, size: int, mtime: float, metadata: dict) -> dict:
+        """Point a name at a blob, recording a new version when the content changed"""
+        current = conn.execute("SELECT content_hash, version FROM resumes WHERE name = ?", (name,)).fetchone()
+        version = current["version"] if current is not None else 0
+        if current is None or current["content_hash"] != blob_hash:
+            version += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO versions (name, version, content_hash, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (name, version, blob_hash, size, mtime),
+            )
+        entry = {
+            "name": name,
+            "kind": os.path.splitext(name)[1].lstrip("."),
+            "size": size,
+            "mtime": mtime,
+            "content_hash": blob_hash,
+            **metadata,
+            "version": version,
+        }
+        conn.execute(
+            f"INSERT OR REPLACE INTO resumes ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            [entry[column] for column in _COLUMNS],
+        )
+        return entry
+
+    @staticmethod
+    def _metadata_for(conn: sqlite3.Connection, name: str, content: bytes, resume: Optional[dict]) -> dict:
+        """Resume metadata from the given dict, the JSON itself, or a PDF's JSON sibling"""
+        if resume is None and name.endswith(".json"):
+            try:
+                resume = json.loads(content)
+            except ValueError:
+                resume = None
+        if resume is None and name.endswith(".pdf"):
+            sibling = conn.execute("SELECT * FROM resumes WHERE name = ?", (_sibling(name),)).fetchone()
+            if sibling is not None:
+                return {column: sibling[column] for column in _METADATA_COLUMNS}
+        return _resume_metadata(resume)
+
+    async def put(self, name: str, content: bytes, resume: Optional[dict] = None, mtime: Optional[float] = None, sha256: Optional[str] = None) -> dict:
+        """
+        Store `content` under `name`. Unchanged content costs no disk write;
+        changed content becomes the name's next version. Returns the index entry.
+        Pass `sha256` when the digest is already known (e.g. from a streamed upload).
+        """
+        def put(conn):
+            blob_hash = self._write_blob(content, sha256)
+            metadata = self._metadata_for(conn, name, content, resume)
+            return self._point(conn, name, blob_hash, len(content), mtime or time.time(), metadata)
+
+        return await self._run(put)
+
+    async def record_render(self, source_hash: str, pdf_hash: str, template_hash: str):
+        """Remember which PDF blob was rendered from a resume JSON blob with which templates"""
+        await self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO renders (source_hash, pdf_hash, template_hash) VALUES (?, ?, ?)",
+            (source_hash, pdf_hash, template_hash)
+        ))
+
+    async def rendered_pdf(self, source_hash: str, template_hash: str) -> Optional[str]:
+        """Hash of a stored PDF rendered from this resume JSON blob with the same templates, if any"""
+        def lookup(conn):
+            row = conn.execute(
+                "SELECT pdf_hash FROM renders WHERE source_hash = ? AND template_hash = ?", (source_hash, template_hash)
+            ).fetchone()
+            if row is None or not os.path.exists(self.blob_path(row["pdf_hash"])):
+                return None
+            return row["pdf_hash"]
+        return await self._run(lookup)
+
+    async def link(self, name: str, blob_hash: str, resume: Optional[dict] = None):
+        """Point `name` at an existing blob without touching its content"""
+        def link(conn):
+            size = os.path.getsize(self.blob_path(blob_hash))
+            return self._point(conn, name, blob_hash, size, time.time(), self._metadata_for(conn, name, b"", resume))
+        return await self._run(link)
+
+    async def remove(self, *names: str):
+        """Delete names with their history, then drop blobs nothing references any more"""
+        def remove(conn):
+            hashes = []
+            for name in names:
+                hashes += [row["content_hash"] for row in conn.execute("SELECT content_hash FROM versions WHERE name = ?", (name,))]
+                hashes += [row["content_hash"] for row in conn.execute("SELECT content_hash FROM resumes WHERE name = ?", (name,))]
+                conn.execute("DELETE FROM resumes WHERE name = ?", (name,))
+                conn.execute("DELETE FROM versions WHERE name = ?", (name,))
+            self._collect_garbage(conn, hashes)
+        await self._run(remove)
+
+    async def rename(self, old_name: str, new_name: str):
+        """
+        Move a name and its history; no file is touched. An existing `new_name`
+        is overwritten and blobs only its history referenced are dropped.
+        """
+        if old_name == new_name:
+            return
+
+        def rename(conn):
+            hashes = [row["content_hash"] for row in conn.execute("SELECT content_hash FROM versions WHERE name = ?", (new_name,))]
+            hashes += [row["content_hash"] for row in conn.execute("SELECT content_hash FROM resumes WHERE name = ?", (new_name,))]
+            conn.execute("DELETE FROM resumes WHERE name = ?", (new_name,))
+            conn.execute("DELETE FROM versions WHERE name = ?", (new_name,))
+            conn.execute("UPDATE resumes SET name = ? WHERE name = ?", (new_name, old_name))
+            conn.execute("UPDATE versions SET name = ? WHERE name = ?", (new_name, old_name))
+            self._collect_garbage(conn, hashes)
+        await self._run(rename)
+
+    async def sync(self) -> int:
+        """
+        Import loose files left directly in RESUME_DIR (older layouts, manual copies)
+        into the blob store. The originals are left in place; a loose file is only
+        imported again once its content changes, becoming the name's next version.
+        Returns the number imported.
+        """
+        def sync(conn):
+            os.makedirs(self.resume_dir, exist_ok=True)
+            loose = [
+                entry for entry in os.scandir(self.resume_dir)
+                if entry.is_file() and entry.name.endswith(LIBRARY_EXTENSIONS)
+            ]
+            # JSON first, so PDFs can borrow their sibling's metadata
+            loose.sort(key=lambda entry: not entry.name.endswith(".json"))
+            imported = 0
+            for entry in loose:
+                with open(entry.path, "rb") as f:
+                    content = f.read()
+                blob_hash = content_hash(content)
+                seen = conn.execute("SELECT content_hash FROM loose_files WHERE name = ?", (entry.name,)).fetchone()
+                if seen is not None and seen["content_hash"] == blob_hash:
+                    continue
+                self._write_blob(content, blob_hash)
+                metadata = self._metadata_for(conn, entry.name, content, None)
+                if conn.execute("SELECT 1 FROM versions WHERE name = ? LIMIT 1", (entry.name,)).fetchone() is None:
+                    # Index row from before version history existed: start a fresh history
+                    conn.execute("DELETE FROM resumes WHERE name = ?", (entry.name,))
+                self._point(conn, entry.name, blob_hash, len(content), entry.stat().st_mtime, metadata)
+                conn.execute("INSERT OR REPLACE INTO loose_files (name, content_hash) VALUES (?, ?)", (entry.name, blob_hash))
+                imported += 1
+            return imported
+
+        imported = await self._run(sync)
+        if imported:
+            print(f"📚 Imported {imported} files into the resume library")
+        return imported
+
+    # ========== READS ==========
+
+    async def get(self, name: str) -> Optional[dict]:
+        """Get one index entry"""
+        row = await self._run(lambda conn: conn.execute("SELECT * FROM resumes WHERE name = ?", (name,)).fetchone())
+        return dict(row) if row is not None else None
+
+    async def resolve(self, name: str, version: Optional[int] = None) -> Optional[str]:
+        """Blob path holding a name's current (or given) version"""
+        def resolve(conn):
+            if version is None:
+                row = conn.execute("SELECT content_hash FROM resumes WHERE name = ?", (name,)).fetchone()
+            else:
+                row = conn.execute("SELECT content_hash FROM versions WHERE name = ? AND version = ?", (name, version)).fetchone()
+            return self.blob_path(row["content_hash"]) if row is not None else None
+        return await self._run(resolve)
+
+    async def history(self, name: str) -> List[dict]:
+        """All versions of a name, newest first"""
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT version, content_hash, size, created_at FROM versions WHERE name = ? ORDER BY version DESC", (name,)
+        ).fetchall())
+        return [dict(row) for row in rows]
+
+    async def list(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = 100,
+        sort: str = "name",
+        order: str = "asc",
+        query: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> Tuple[List[dict], int]:
+        """
+        One page of entries plus the total number of matches; `limit=None` returns
+        every match. Without `kind` only DEFAULT_LIST_KINDS are listed.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column {sort!r}; choose one of {sorted(SORT_COLUMNS)}")
+        direction = "DESC" if order.lower() == "desc" else "ASC"
+        # SQLite treats a negative LIMIT as no limit
+        limit = -1 if limit is None else max(1, min(limit, MAX_PAGE_SIZE))
+
+        where, params = [], []
+        if query:
+            where.append("(name LIKE ? OR contact_name LIKE ?)")
+            params += [f"%{query}%", f"%{query}%"]
+        kinds = [kind] if kind else list(DEFAULT_LIST_KINDS)
+        where.append(f"kind IN ({', '.join('?' * len(kinds))})")
+        params += kinds
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        def page(conn):
+            total = conn.execute(f"SELECT COUNT(*) FROM resumes {clause}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM resumes {clause} ORDER BY {sort} {direction}, name ASC LIMIT ? OFFSET ?",
+                params + [limit, max(0, offset)],
+            ).fetchall()
+            return [dict(row) for row in rows], total
+
+        return await self._run(page)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Global library instance
+_library: Optional[ResumeLibrary] = None
+
+
+def get_library() -> ResumeLibrary:
+    """Get the global resume library instance"""
+    global _library
+    if _library is None:
+        _library = ResumeLibrary()
+    return _library
@@ -0,0 +1,189 @@
+"""
+Async LLM client layer for Adaptive-CV
+Wraps litellm's async completion API with per-provider concurrency limits,
+timeouts and cancellation when the HTTP client goes away
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+from litellm import acompletion
+
+T = TypeVar("T")
+
+# Concurrency Configuration (max in-flight calls per provider, per worker)
+LLM_MAX_CONCURRENCY = {
+    "gemini": int(os.getenv("LLM_MAX_CONCURRENCY_GEMINI", 32)),
+    "openai": int(os.getenv("LLM_MAX_CONCURRENCY_OPENAI", 32)),
+}
+LLM_DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+
+# Timeouts (in seconds)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
+DISCONNECT_POLL_INTERVAL = 0.5
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_usage_totals: Dict[str, dict] = {}
+_recent_calls = deque(maxlen=50)
+
+
+@asynccontextmanager
+async def aclosing(stream):
+    """contextlib.aclosing for Python 3.9: close an async generator on exit"""
+    try:
+        yield stream
+    finally:
+        await stream.aclose()
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call exceeds its timeout"""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the HTTP client disconnects while an LLM call is in flight"""
+
+
+def resolve_model(provider: str, model_name: str) -> str:
+    """Map a provider/model pair to a litellm model identifier"""
+    return f"gemini/{model_name}" if provider == "gemini" else "gpt-4o"
+
+
+def build_completion_kwargs(provider: str, model_name: str, messages: list, **extra) -> dict:
+    """Build the keyword arguments for a litellm completion call"""
+    completion_kwargs = {
+        "model": resolve_model(provider, model_name),
+        "messages": messages,
+        **extra,
+    }
+
+    # Add reasoning_effort for Gemini 3+ or thinking models
+    if "gemini-3" in model_name or "thinking" in model_name:
+        completion_kwargs["reasoning_effort"] = "low"
+
+    return completion_kwargs
+
+
+def _get_semaphore(provider: str) -> asyncio.Semaphore:
+    """Get (or lazily create) the concurrency limiter for a provider"""
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        limit = LLM_MAX_CONCURRENCY.get(provider, LLM_DEFAULT_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        _semaphores[provider] = semaphore
+    return semaphore
+
+
+def record_usage(provider: str, purpose: str, model: str, usage, started_at: float):
+    """Record and log the token counts reported for one call"""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    totals = _usage_totals.setdefault(provider, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    totals["calls"] += 1
+    totals["prompt_tokens"] += prompt_tokens
+    totals["completion_tokens"] += completion_tokens
+    latency_ms = round((time.perf_counter() - started_at) * 1000, 1)
+    _recent_calls.append({
+        "purpose": purpose,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_ms": latency_ms,
+    })
+    print(f"DEBUG: {purpose} call to {model}: {prompt_tokens} prompt + {completion_tokens} completion tokens in {latency_ms}ms", flush=True)
+
+
+async def acomplete(provider: str, api_key: str, timeout: Optional[float] = None, purpose: str = "completion", **completion_kwargs):
+    """
+    Run a non-blocking completion under the provider's concurrency limit.
+    The API key is passed per call so concurrent requests never share credentials.
+    """
+    timeout = timeout or LLM_TIMEOUT
+    async with _get_semaphore(provider):
+        started_at = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                acompletion(api_key=api_key, timeout=timeout, **completion_kwargs),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.0f}s")
+        record_usage(provider, purpose, completion_kwargs.get("model"), getattr(response, "usage", None), started_at)
+        return response
+
+
+async def astream(provider: str, api_key: str, timeout: Optional[float] = None, purpose: str = "completion", **completion_kwargs) -> AsyncIterator:
+    """
+    Stream completion chunks, holding the provider's concurrency slot for the whole stream.
+    `timeout` bounds the wait for each chunk. Closing the iterator early (e.g. on
+    client disconnect) closes the upstream stream too.
+    """
+    timeout = timeout or LLM_TIMEOUT
+    async with _get_semaphore(provider):
+        started_at = time.perf_counter()
+        usage = None
+        try:
+            response = await asyncio.wait_for(
+                acompletion(
+                    api_key=api_key,
+                    timeout=timeout,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **completion_kwargs
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.0f}s")
+
+        chunks = response.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"LLM stream stalled for {timeout:.0f}s")
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+            record_usage(provider, purpose, completion_kwargs.get("model"), usage, started_at)
+        finally:
+            close = getattr(response, "aclose", None)
+            if close is not None:
+                await close()
+
+
+async def run_cancellable(coro: Awaitable[T], is_disconnected: Callable[[], Awaitable[bool]]) -> T:
+    """
+    Await a coroutine, cancelling it if the client disconnects first.
+    `is_disconnected` is typically `request.is_disconnected` from Starlette.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                print("DEBUG: Client disconnected, cancelled LLM call", flush=True)
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def get_stats() -> dict:
+    """Get in-flight call counts and token usage per provider, plus recent calls"""
+    providers = {}
+    for provider, semaphore in _semaphores.items():
+        limit = LLM_MAX_CONCURRENCY.get(provider, LLM_DEFAULT_MAX_CONCURRENCY)
+        providers[provider] = {
+            "limit": limit,
+            "in_flight": limit - semaphore._value,
+            **_usage_totals.get(provider, {}),
+        }
+    return {"providers": providers, "recent_calls": list(_recent_calls)}
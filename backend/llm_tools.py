@@ -0,0 +1,111 @@
+"""
+Registry of LLM tool and response schemas for Adaptive-CV
+Schemas are generated once at import and the provider-specific request
+payloads built from them are cached, so chat and parse calls reuse them.
+New resume sections register their tool with `register_section_tool`.
+"""
+import copy
+from typing import Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from models import Resume, ContactInfo, EducationItem, ExperienceItem, ProjectItem, SkillCategory, CustomSection
+from prompts import compact_schema
+
+# Tool name -> OpenAI-style tool definition
+_tools: Dict[str, dict] = {}
+# Tool name -> (Resume field it updates, argument holding the new value; None = whole arguments)
+_tool_targets: Dict[str, Tuple[str, Optional[str]]] = {}
+# Provider -> cached request payloads; cleared whenever the registry changes
+_payload_cache: Dict[str, dict] = {}
+
+
+def register_tool(name: str, description: str, parameters: dict, field: Optional[str] = None, argument: Optional[str] = None):
+    """
+    Register a chat tool. `field`/`argument` say which Resume field the tool
+    replaces and which argument carries the value (None = the whole arguments object).
+    """
+    _tools[name] = {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": compact_schema(parameters)
+        }
+    }
+    if field is not None:
+        _tool_targets[name] = (field, argument)
+    _payload_cache.clear()
+
+
+def register_section_tool(field: str, item_model: Type[BaseModel], description: str, name: Optional[str] = None):
+    """Register an `update_<field>` tool that replaces a list section of the Resume"""
+    register_tool(
+        name or f"update_{field}",
+        description,
+        {
+            "type": "object",
+            "properties": {
+                field: {
+                    "type": "array",
+                    "items": item_model.model_json_schema()
+                }
+            },
+            "required": [field]
+        },
+        field=field,
+        argument=field
+    )
+
+
+def get_tool_target(name: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Get the (Resume field, argument) a tool updates, if it updates one"""
+    return _tool_targets.get(name)
+
+
+def get_chat_tools(provider: str) -> List[dict]:
+    """
+    Tool list for chat requests, built once per provider.
+    Returns a copy: litellm rewrites tool schemas in place for some providers.
+    """
+    payload = _payload_cache.setdefault(provider, {})
+    if "tools" not in payload:
+        payload["tools"] = list(_tools.values())
+    return copy.deepcopy(payload["tools"])
+
+
+def get_resume_response_format(provider: str) -> dict:
+    """Structured-output request parameter for resume parsing, built once per provider (copied, as above)"""
+    payload = _payload_cache.setdefault(provider, {})
+    if "response_format" not in payload:
+        payload["response_format"] = {
+            "type": "json_object",
+            "response_schema": RESUME_SCHEMA
+        }
+    return copy.deepcopy(payload["response_format"])
+
+
+RESUME_SCHEMA = compact_schema(Resume.model_json_schema())
+
+register_tool(
+    "update_contact_info",
+    "Update contact information",
+    ContactInfo.model_json_schema(),
+    field="contact"
+)
+register_tool(
+    "update_summary",
+    "Update professional summary",
+    {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string", "description": "The new summary text"}
+        },
+        "required": ["summary"]
+    },
+    field="summary",
+    argument="summary"
+)
+register_section_tool("education", EducationItem, "Update education section (replaces entire list)")
+register_section_tool("experience", ExperienceItem, "Update experience section (replaces entire list)")
+register_section_tool("projects", ProjectItem, "Update projects section (replaces entire list)")
+register_section_tool("skills", SkillCategory, "Update skills section (replaces entire list)")
+register_section_tool("custom_sections", CustomSection, "Update custom sections (Certifications, Awards, etc.). Replaces entire list.")
@@ -0,0 +1,517 @@
+"""
+Deterministic, LLM-free resume parser for Adaptive-CV
+Recognizes the project's own LaTeX macros (\\resumeSubheading, \\resumeItem, ...)
+and the font/layout cues of PDFs rendered from templates/resume.tex.
+Every parse returns a confidence score so callers can fall back to the LLM.
+"""
+import json
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+import fitz  # PyMuPDF
+from models import Resume, ContactInfo, EducationItem, ExperienceItem, ProjectItem, SkillCategory, CustomSection
+from renderer import SOURCE_ATTACHMENT
+
+# Parses scoring at or above this are trusted without an LLM call
+LOCAL_PARSE_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSE_MIN_CONFIDENCE", 0.85))
+
+ParseResult = Tuple[Optional[Resume], float]
+
+_WORD_RE = re.compile(r"\w+")
+_DATE_RE = re.compile(r"\b(?:19|20)\d{2}\b|\bpresent\b|\bcurrent\b", re.IGNORECASE)
+_PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_BULLET_CHARS = "•◦∙·▪–-*"
+
+
+def _section_kind(title: str) -> str:
+    """Map a section title to a Resume field"""
+    title = title.lower()
+    if "education" in title:
+        return "education"
+    if "experience" in title or "employment" in title or "work history" in title:
+        return "experience"
+    if "project" in title:
+        return "projects"
+    if "skill" in title:
+        return "skills"
+    if "summary" in title or "profile" in title or "objective" in title:
+        return "summary"
+    return "custom"
+
+
+def _split_dates(value: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split 'Sep 2018 -- Jun 2022' into start and end dates"""
+    parts = re.split(r"\s*(?:--|–|—|\s-\s)\s*", value, maxsplit=1)
+    start = parts[0].strip() or None
+    end = parts[1].strip() if len(parts) > 1 else None
+    return start, end or None
+
+
+def _split_list(value: str) -> List[str]:
+    """Split a comma-separated list, keeping commas inside parentheses"""
+    return [item.strip() for item in re.split(r",(?![^()]*\))", value) if item.strip()]
+
+
+def _is_date_range(value: str) -> bool:
+    return bool(value and _DATE_RE.search(value))
+
+
+def _coverage(resume: Resume, source_text: str, titles: List[str]) -> float:
+    """Fraction of the document's words that ended up in the structured resume"""
+    source_words = Counter(w.lower() for w in _WORD_RE.findall(source_text))
+    if not source_words:
+        return 0.0
+    captured_text = json.dumps(resume.model_dump(exclude_none=True)) + " " + " ".join(titles)
+    captured_words = Counter(w.lower() for w in _WORD_RE.findall(captured_text))
+    captured = sum(min(count, captured_words[word]) for word, count in source_words.items())
+    return captured / sum(source_words.values())
+
+
+def _assign_link(contact: dict, url: str):
+    """Sort a contact URL into the matching ContactInfo field"""
+    if url.startswith("mailto:"):
+        contact.setdefault("email", url[len("mailto:"):])
+    elif "linkedin." in url:
+        contact.setdefault("linkedin", url)
+    elif "github." in url:
+        contact.setdefault("github", url)
+    elif url.startswith("http"):
+        contact.setdefault("website", url)
+
+
+# ========== LATEX ==========
+
+_LATEX_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_LATEX_ESCAPES = {
+    "textbackslash": "\\", "textasciitilde": "~", "textasciicircum": "^",
+    "&": "&", "%": "%", "$": "$", "#": "#", "_": "_", "{": "{", "}": "}",
+}
+_LATEX_ESCAPE_RE = re.compile(r"\\(textbackslash|textasciitilde|textasciicircum|[&%$#_{}])")
+# Commands whose arguments are layout, not content
+_LATEX_DROP_RE = re.compile(r"\\(?:vspace|hspace|includegraphics|begin|end|label|color|setlength)\*?\s*(?:\[[^\]]*\])?\s*(?:\{[^{}]*\})?(?:\[[^\]]*\])?")
+_LATEX_COMMAND_RE = re.compile(r"\\[a-zA-Z]+\*?")
+_PLACEHOLDER_BASE = 0xE000
+
+
+def _read_group(text: str, pos: int) -> Tuple[Optional[str], int]:
+    """Read a brace-balanced {group} starting at or after `pos`"""
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    if pos >= len(text) or text[pos] != "{":
+        return None, pos
+    depth = 0
+    start = pos
+    while pos < len(text):
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:pos], pos + 1
+        pos += 1
+    return None, len(text)
+
+
+def _read_args(text: str, pos: int, count: int) -> Tuple[Optional[List[str]], int]:
+    """Read `count` consecutive {group} arguments"""
+    args = []
+    for _ in range(count):
+        arg, pos = _read_group(text, pos)
+        if arg is None:
+            return None, pos
+        args.append(arg)
+    return args, pos
+
+
+def latex_to_text(source: str) -> str:
+    """Strip LaTeX markup down to the text a reader would see"""
+    source = _LATEX_COMMENT_RE.sub("", source)
+
+    # Protect escaped characters from the brace and command stripping below
+    escapes = []
+    def protect(match):
+        escapes.append(_LATEX_ESCAPES[match.group(1)])
+        return chr(_PLACEHOLDER_BASE + len(escapes) - 1)
+    source = _LATEX_ESCAPE_RE.sub(protect, source)
+
+    # \href{url}{text} -> text
+    while "\\href" in source:
+        start = source.index("\\href")
+        args, end = _read_args(source, start + len("\\href"), 2)
+        source = source[:start] + (args[1] if args else "") + source[end if args else start + len("\\href"):]
+
+    source = source.replace("$|$", "|").replace("\\\\", " ").replace("~", " ")
+    source = _LATEX_DROP_RE.sub(" ", source)
+    source = _LATEX_COMMAND_RE.sub(" ", source)
+    source = source.replace("{", "").replace("}", "").replace("$", "")
+
+    source = "".join(
+        escapes[ord(char) - _PLACEHOLDER_BASE] if _PLACEHOLDER_BASE <= ord(char) < _PLACEHOLDER_BASE + len(escapes) else char
+        for char in source
+    )
+    return re.sub(r"\s+", " ", source).strip()
+
+
+# Only sources rendered from our templates are known to use our macro argument
+# order; Jake's resume and its forks define the same macros but put experience
+# as {title}{dates}{company}{location}
+_OWN_TEMPLATE_RE = re.compile(r"\\input\s*\{preamble(?:\.tex)?\}|^% Heading with optional logo$", re.MULTILINE)
+# Factor applied when the argument order or some arguments can't be trusted,
+# enough to push an otherwise complete parse below LOCAL_PARSE_MIN_CONFIDENCE
+_UNTRUSTED_FACTOR = 0.5
+
+_EVENT_RE = re.compile(r"\\(resumeSubheading|resumeProjectHeading|resumeSubSubheading|resumeItem|resumeSubItem|item)\b")
+_EVENT_ARGS = {"resumeSubheading": 4, "resumeProjectHeading": 2, "resumeSubSubheading": 2, "resumeItem": 1, "resumeSubItem": 1}
+
+
+def _tex_events(body: str) -> List[Tuple[str, list]]:
+    """Tokenize a section body into headings and bullet items (arguments stay raw LaTeX)"""
+    events = []
+    pos = 0
+    while True:
+        match = _EVENT_RE.search(body, pos)
+        if not match:
+            break
+        name = match.group(1)
+        if name == "item":
+            next_match = _EVENT_RE.search(body, match.end())
+            end = next_match.start() if next_match else len(body)
+            if latex_to_text(body[match.end():end]):
+                events.append(("item", [body[match.end():end]]))
+            pos = end
+            continue
+
+        args, end = _read_args(body, match.end(), _EVENT_ARGS[name])
+        if args is None:
+            pos = match.end()
+            continue
+        if name in ("resumeItem", "resumeSubItem"):
+            # Our template wraps a nested itemize in \resumeItem; others use it per bullet
+            if "\\item" in args[0]:
+                events.extend(_tex_events(args[0]))
+            elif latex_to_text(args[0]):
+                events.append(("item", args))
+        else:
+            events.append((name, args))
+        pos = end
+    return events
+
+
+def _tex_sections(document: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split a document body into the heading and (title, body) sections"""
+    starts = [m for m in re.finditer(r"\\section\*?\s*(?=\{)", document)]
+    header = document[:starts[0].start()] if starts else document
+    sections = []
+    for index, match in enumerate(starts):
+        title, body_start = _read_group(document, match.end())
+        body_end = starts[index + 1].start() if index + 1 < len(starts) else len(document)
+        sections.append((latex_to_text(title or ""), document[body_start:body_end]))
+    return header, sections
+
+
+def _tex_contact(header: str) -> dict:
+    """Extract contact details from the heading block"""
+    contact = {}
+    name_match = re.search(r"\\textbf\s*(?=\{)", header)
+    if name_match:
+        name, name_end = _read_group(header, name_match.end())
+        contact["name"] = latex_to_text(name or "")
+        # Contact details follow the name; anything before it is layout (logo, minipages)
+        header = header[name_end:]
+
+    for match in re.finditer(r"\\href\s*(?=\{)", header):
+        args, _ = _read_args(header, match.end(), 2)
+        if args:
+            _assign_link(contact, latex_to_text(args[0]))
+
+    header_text = latex_to_text(header)
+    phone = _PHONE_RE.search(header_text)
+    if phone:
+        contact.setdefault("phone", phone.group(0).strip())
+    email = _EMAIL_RE.search(header_text)
+    if email:
+        contact.setdefault("email", email.group(0))
+    return contact
+
+
+def _tex_skills(body: str) -> List[SkillCategory]:
+    """Parse '\\textbf{Category}: a, b, c \\\\' lines"""
+    skills = []
+    for line in re.split(r"\\\\", body):
+        text = latex_to_text(line)
+        if ":" not in text:
+            continue
+        category, values = text.split(":", 1)
+        items = _split_list(values)
+        if category.strip() and items:
+            skills.append(SkillCategory(category=category.strip(), skills=items))
+    return skills
+
+
+def parse_tex_locally(source: str) -> ParseResult:
+    """
+    Parse LaTeX that uses the project's template macros.
+    Returns (resume, confidence); resume is None when nothing usable was found.
+    """
+    own_template = bool(_OWN_TEMPLATE_RE.search(source))
+    source = _LATEX_COMMENT_RE.sub("", source)
+    begin = source.find("\\begin{document}")
+    document = source[begin + len("\\begin{document}"):] if begin != -1 else source
+    document = document.split("\\end{document}")[0]
+
+    header, sections = _tex_sections(document)
+    contact = _tex_contact(header)
+    if not contact.get("name") or not sections:
+        return None, 0.0
+
+    data = {"education": [], "experience": [], "projects": [], "skills": [], "custom_sections": []}
+    # Non-empty macro arguments that map to no Resume field
+    dropped = 0
+    for title, body in sections:
+        kind = _section_kind(title)
+        if kind == "summary":
+            data["summary"] = latex_to_text(body) or None
+            continue
+        if kind == "skills":
+            data["skills"].extend(_tex_skills(body))
+            continue
+
+        events = _tex_events(body)
+        if kind == "custom":
+            items = [latex_to_text(args[0]) for name, args in events if name == "item"]
+            if items:
+                data["custom_sections"].append(CustomSection(title=title, items=items))
+            continue
+
+        for name, args in events:
+            texts = [latex_to_text(arg) for arg in args]
+            if kind == "education" and name == "resumeSubheading":
+                # Our template: {institution}{dates}{degree}{gpa}; common variant: {institution}{location}{degree}{dates}
+                if _is_date_range(texts[1]) or not _is_date_range(texts[3]):
+                    dates, gpa = texts[1], texts[3]
+                else:
+                    dates, gpa = texts[3], None
+                    dropped += bool(texts[1])
+                start, end = _split_dates(dates)
+                data["education"].append(EducationItem(institution=texts[0], degree=texts[2], start_date=start, end_date=end, gpa=gpa or None))
+            elif kind == "experience" and name == "resumeSubheading":
+                start, end = _split_dates(texts[1])
+                data["experience"].append(ExperienceItem(company=texts[0], position=texts[2], start_date=start, end_date=end))
+                # Our template leaves the fourth argument empty
+                dropped += bool(texts[3])
+            elif kind == "projects" and name == "resumeProjectHeading":
+                name_part, _, technologies = texts[0].partition("|")
+                data["projects"].append(ProjectItem(name=name_part.strip(), technologies=technologies.strip() or None, link=texts[1] or None))
+            elif name == "item":
+                target = {"experience": data["experience"], "projects": data["projects"]}.get(kind)
+                if target:
+                    target[-1].description.append(texts[0])
+                else:
+                    dropped += 1
+            else:
+                dropped += any(texts)
+
+    try:
+        resume = Resume(contact=ContactInfo(**contact), **data)
+    except ValueError:
+        return None, 0.0
+
+    titles = [title for title, _ in sections]
+    confidence = _coverage(resume, latex_to_text(document), titles)
+    if not _EVENT_RE.search(document.replace("\\item", "")):
+        # Plain LaTeX without the template macros is parsed by structure alone
+        confidence *= 0.5
+    if not own_template:
+        # Same macro names, but the arguments may be in another order
+        confidence *= _UNTRUSTED_FACTOR
+    if dropped:
+        # Word coverage can't see content that was thrown away or put in the wrong field
+        confidence *= _UNTRUSTED_FACTOR
+    return resume, round(min(confidence, 1.0), 3)
+
+
+# ========== PDF ==========
+
+def _embedded_resume(doc: "fitz.Document") -> Optional[Resume]:
+    """
+    Read the source Resume attached to library PDFs (rendered by RenderPool,
+    attached by /save-version).
+    A logo_path from older attachments is dropped: it is a server path, not content.
+    """
+    try:
+        if SOURCE_ATTACHMENT not in doc.embfile_names():
+            return None
+        resume = Resume.model_validate_json(doc.embfile_get(SOURCE_ATTACHMENT))
+        return resume.model_copy(update={"logo_path": None})
+    except Exception as e:
+        print(f"Embedded resume read error: {e}")
+        return None
+
+
+def _pdf_rows(doc: "fitz.Document") -> List[dict]:
+    """Group text spans into visual rows, split into cells at wide horizontal gaps"""
+    rows = []
+    for page in doc:
+        spans = []
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    if span["text"].strip():
+                        spans.append(span)
+        spans.sort(key=lambda span: (round(span["origin"][1]), span["bbox"][0]))
+
+        page_rows = []
+        for span in spans:
+            if page_rows and abs(page_rows[-1][0]["origin"][1] - span["origin"][1]) <= 2:
+                page_rows[-1].append(span)
+            else:
+                page_rows.append([span])
+
+        for row_spans in page_rows:
+            row_spans.sort(key=lambda span: span["bbox"][0])
+            cells = [[row_spans[0]]]
+            for span in row_spans[1:]:
+                gap = span["bbox"][0] - cells[-1][-1]["bbox"][2]
+                if gap > span["size"] * 2:
+                    cells.append([span])
+                else:
+                    cells[-1].append(span)
+            rows.append({
+                "cells": ["".join(s["text"] for s in cell).strip() for cell in cells],
+                "size": max(s["size"] for s in row_spans),
+                "bold": bool(row_spans[0]["flags"] & 16) or "bold" in row_spans[0]["font"].lower() or "-bx" in row_spans[0]["font"].lower(),
+                "italic": bool(row_spans[0]["flags"] & 2) or "italic" in row_spans[0]["font"].lower(),
+                "x0": row_spans[0]["bbox"][0],
+                "fonts": {s["font"] for s in row_spans},
+            })
+    return rows
+
+
+def _body_size(rows: List[dict]) -> float:
+    """Most common font size, weighted by characters"""
+    sizes = Counter()
+    for row in rows:
+        sizes[round(row["size"], 1)] += sum(len(cell) for cell in row["cells"])
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def parse_pdf_locally(file_content: bytes) -> ParseResult:
+    """
+    Parse a PDF rendered from templates/resume.tex.
+    Library PDFs from our own renderer carry their source Resume and parse exactly;
+    others are read from font and layout cues.
+    Returns (resume, confidence); resume is None when nothing usable was found.
+    """
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    embedded = _embedded_resume(doc)
+    if embedded is not None:
+        return embedded, 1.0
+
+    rows = _pdf_rows(doc)
+    if not rows:
+        return None, 0.0
+
+    body_size = _body_size(rows)
+    name_row = max(rows[:5], key=lambda row: row["size"])
+    name_index = rows.index(name_row)
+    contact = {"name": " ".join(name_row["cells"])}
+
+    for page in doc:
+        for link in page.get_links():
+            if link.get("uri"):
+                _assign_link(contact, link["uri"])
+
+    sections = []
+    for row in rows[name_index + 1:]:
+        is_heading = row["size"] > body_size * 1.1 and len(row["cells"]) == 1 and not row["cells"][0][0] in _BULLET_CHARS
+        if is_heading:
+            sections.append((row["cells"][0], []))
+        elif sections:
+            sections[-1][1].append(row)
+        else:
+            header_text = " ".join(row["cells"])
+            phone = _PHONE_RE.search(header_text)
+            if phone:
+                contact.setdefault("phone", phone.group(0).strip())
+            email = _EMAIL_RE.search(header_text)
+            if email:
+                contact.setdefault("email", email.group(0))
+    if not sections:
+        return None, 0.0
+
+    data = {"education": [], "experience": [], "projects": [], "skills": [], "custom_sections": []}
+    for title, section_rows in sections:
+        kind = _section_kind(title)
+        items: List[str] = []
+        pending_heading: Optional[List[str]] = None
+
+        def flush_heading(second_line: Optional[List[str]] = None):
+            nonlocal pending_heading
+            if pending_heading is None:
+                return
+            first = pending_heading + [""] * (2 - len(pending_heading))
+            second = (second_line or []) + [""] * (2 - len(second_line or []))
+            start, end = _split_dates(first[1])
+            if kind == "education":
+                data["education"].append(EducationItem(institution=first[0], degree=second[0], start_date=start, end_date=end, gpa=second[1] or None))
+            elif kind == "experience":
+                data["experience"].append(ExperienceItem(company=first[0], position=second[0], start_date=start, end_date=end))
+            pending_heading = None
+
+        last_was_bullet = False
+        for row in section_rows:
+            text = " ".join(row["cells"])
+            target = {"experience": data["experience"], "projects": data["projects"]}.get(kind)
+            if text[0] in _BULLET_CHARS:
+                flush_heading()
+                items.append(text[1:].strip())
+                if target:
+                    target[-1].description.append(items[-1])
+                last_was_bullet = True
+                continue
+
+            if last_was_bullet and not row["bold"] and not row["italic"]:
+                # Wrapped continuation of the previous bullet
+                items[-1] = f"{items[-1]} {text}"
+                if target and target[-1].description:
+                    target[-1].description[-1] = items[-1]
+                continue
+            last_was_bullet = False
+
+            if kind in ("education", "experience"):
+                if pending_heading is not None and row["italic"]:
+                    flush_heading(row["cells"])
+                elif row["bold"]:
+                    flush_heading()
+                    pending_heading = row["cells"]
+            elif kind == "projects" and row["bold"]:
+                name_part, _, technologies = row["cells"][0].partition("|")
+                link = row["cells"][1] if len(row["cells"]) > 1 else None
+                data["projects"].append(ProjectItem(name=name_part.strip(), technologies=technologies.strip() or None, link=link))
+            elif kind == "skills" and ":" in text:
+                category, values = text.split(":", 1)
+                data["skills"].append(SkillCategory(category=category.strip(), skills=_split_list(values)))
+            elif kind == "summary":
+                data["summary"] = f"{data.get('summary') or ''} {text}".strip()
+        flush_heading()
+
+        if kind == "custom" and items:
+            data["custom_sections"].append(CustomSection(title=title, items=items))
+
+    try:
+        resume = Resume(contact=ContactInfo(**contact), **data)
+    except ValueError:
+        return None, 0.0
+
+    page_text = " ".join(" ".join(row["cells"]) for row in rows)
+    confidence = _coverage(resume, page_text, [title for title, _ in sections])
+    if not any("lmroman" in font.lower() for row in rows for font in row["fonts"]):
+        # Not typeset with our template's Latin Modern fonts
+        confidence *= 0.6
+    return resume, round(min(confidence, 1.0), 3)
@@ -0,0 +1,111 @@
+"""
+Logo storage for Adaptive-CV
+Uploaded logos are downscaled to the size the template prints them at,
+re-encoded and stored under the upload's content hash, so repeat uploads
+reuse one file and compile time and PDF size don't depend on the original
+"""
+import os
+import struct
+import tempfile
+import fitz  # PyMuPDF
+from pdf_text import run_fitz
+
+LOGO_DIR = os.getenv("LOGO_DIR", "logos")
+# The template prints the logo at 0.15\textwidth (about 1in on A4); 300px is 300 DPI there
+LOGO_MAX_WIDTH = int(os.getenv("LOGO_MAX_WIDTH", 300))
+LOGO_JPEG_QUALITY = int(os.getenv("LOGO_JPEG_QUALITY", 85))
+# Decoding is refused above this many pixels (a 16MP RGBA image is 64MB in memory)
+LOGO_MAX_PIXELS = int(os.getenv("LOGO_MAX_PIXELS", 16_000_000))
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers (SOF0-SOF15 except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class LogoError(Exception):
+    """Raised when an uploaded logo cannot be decoded as an image"""
+
+
+def _image_size(content: bytes) -> tuple:
+    """Read (width, height) from a PNG IHDR or JPEG SOF header without decoding the image"""
+    if content.startswith(_PNG_SIGNATURE) and content[12:16] == b"IHDR":
+        return struct.unpack(">II", content[16:24])
+
+    if content.startswith(b"\xff\xd8"):
+        pos = 2
+        while pos + 4 <= len(content):
+            if content[pos] != 0xFF:
+                break
+            marker = content[pos + 1]
+            if marker == 0xFF:
+                pos += 1  # Fill byte
+                continue
+            if marker in (0x01, *range(0xD0, 0xD8)):
+                pos += 2  # Markers without a length
+                continue
+            (length,) = struct.unpack(">H", content[pos + 2:pos + 4])
+            if marker in _JPEG_SOF_MARKERS and pos + 9 <= len(content):
+                height, width = struct.unpack(">HH", content[pos + 5:pos + 9])
+                return width, height
+            pos += 2 + length
+
+    raise LogoError("Only PNG and JPEG images are supported")
+
+
+def _normalize(content: bytes) -> tuple:
+    """
+    Downscale to LOGO_MAX_WIDTH and re-encode. Images with transparency stay
+    PNG; everything else becomes JPEG. Returns (image bytes, extension).
+    """
+    width, height = _image_size(content)
+    if width * height > LOGO_MAX_PIXELS:
+        raise LogoError(f"Image is {width}x{height}; the limit is {LOGO_MAX_PIXELS // 1_000_000} megapixels")
+
+    try:
+        pixmap = fitz.Pixmap(content)
+    except Exception as e:
+        raise LogoError(f"Could not read image: {e}")
+
+    # CMYK or indexed images: convert so both encoders accept them
+    if pixmap.colorspace is not None and pixmap.colorspace.n not in (1, 3):
+        pixmap = fitz.Pixmap(fitz.csRGB, pixmap)
+
+    if pixmap.width > LOGO_MAX_WIDTH:
+        height = max(1, round(pixmap.height * LOGO_MAX_WIDTH / pixmap.width))
+        pixmap = fitz.Pixmap(pixmap, LOGO_MAX_WIDTH, height, None)
+
+    if pixmap.alpha:
+        return pixmap.tobytes("png"), "png"
+    return pixmap.tobytes("jpeg", jpg_quality=LOGO_JPEG_QUALITY), "jpg"
+
+
+def _store_logo(content: bytes, content_hash: str) -> str:
+    prefix = f"logo_{content_hash[:16]}"
+    for extension in ("png", "jpg"):
+        existing = os.path.join(LOGO_DIR, f"{prefix}.{extension}")
+        if os.path.exists(existing):
+            return existing
+
+    image, extension = _normalize(content)
+    os.makedirs(LOGO_DIR, exist_ok=True)
+    path = os.path.join(LOGO_DIR, f"{prefix}.{extension}")
+    # Write atomically so a concurrent render never reads a partial image; the
+    # unique temp name lets two threads store the same logo at once
+    fd, tmp_path = tempfile.mkstemp(dir=LOGO_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    print(f"🖼️ Stored logo {os.path.basename(path)} ({len(content)} -> {len(image)} bytes)")
+    return path
+
+
+async def store_logo(content: bytes, content_hash: str) -> str:
+    """
+    Store a logo under the upload's SHA-256 hex digest and return its path.
+    Repeat uploads return the existing file without decoding the image again.
+    """
+    return await run_fitz(_store_logo, content, content_hash)
@@ -1,28 +1,70 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form
-from pydantic import BaseModel
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form, Request
+from pydantic import BaseModel, HttpUrl
+from typing import Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 import shutil
 import os
+import mimetypes
 import json
 import aiofiles
 import aiofiles.os
+import asyncio
+from contextlib import asynccontextmanager
 from models import Resume
-from parser import parse_pdf, parse_tex
-from renderer import render_pdf
-from ai_engine import improve_resume_section, chat_with_resume
+from parser import parse_resume_file
+from pdf_text import close_extractor, run_fitz
+from renderer import get_render_pool, render_html, schedule_warm_up, attach_source, TEMPLATE_HASH
+from render_jobs import get_render_queue, QueueFullError, WebhookURLError
+from ai_engine import improve_resume_section, improve_resume, chat_with_resume, stream_chat_with_resume
+from llm_client import aclosing, run_cancellable, ClientDisconnected, LLMTimeoutError
+import llm_client
 from cache import get_cache
+from library import RESUME_DIR, canonical_json, get_library
+from uploads import hash_upload, content_length_exceeds, UploadTooLargeError, InvalidUploadError, MAX_RESUME_UPLOAD_BYTES, MAX_LOGO_UPLOAD_BYTES
+from bulk_import import get_import_manager, ImportInProgressError, MAX_IMPORT_UPLOAD_BYTES
+from logos import LOGO_DIR, store_logo, LogoError
+from thumbnails import get_thumbnail, ThumbnailError, DEFAULT_THUMBNAIL_WIDTH
+from chat_sessions import create_session, load_session, apply_patch, record_turn, SessionNotFound
 
-app = FastAPI(title="Adaptive-CV API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await get_cache().connect()
+    # Precompile the LaTeX preamble in the background so the first render is fast
+    schedule_warm_up()
+    get_render_queue().start()
+    await get_library().sync()
+    yield
+    await get_render_queue().stop()
+    await get_import_manager().stop()
+    get_render_pool().close()
+    close_extractor()
+    get_library().close()
+    await get_cache().close()
 
-# Directory configuration
-RESUME_DIR = "resumes"
-LOGO_DIR = "logos"
+app = FastAPI(title="Adaptive-CV API", lifespan=lifespan)
+
+# Directory configuration (RESUME_DIR and LOGO_DIR live in library.py and logos.py)
 
 # Ensure directories exist on startup
 os.makedirs(RESUME_DIR, exist_ok=True)
 os.makedirs(LOGO_DIR, exist_ok=True)
 
+# Per-endpoint upload limits, enforced from Content-Length before the body is received
+UPLOAD_LIMITS = {
+    "/parse": MAX_RESUME_UPLOAD_BYTES,
+    "/upload-logo": MAX_LOGO_UPLOAD_BYTES,
+    "/import": MAX_IMPORT_UPLOAD_BYTES,
+}
+
+# Registered before CORS so CORS stays outermost and 413s still carry its headers
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    max_bytes = UPLOAD_LIMITS.get(request.url.path)
+    if max_bytes is not None and content_length_exceeds(request.headers.get("content-length"), max_bytes):
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds the {max_bytes} byte limit"})
+    return await call_next(request)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,77 +78,111 @@ app.add_middleware(
 async def root():
     return {"message": "Welcome to Adaptive-CV API"}
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """Get in-flight LLM call counts per provider"""
+    return llm_client.get_stats()
+
+@app.get("/render/stats")
+async def render_stats():
+    """Get render pool queue depth and per-job timings, plus render job queue counters"""
+    return {**get_render_pool().get_stats(), "job_queue": get_render_queue().get_stats()}
+
 @app.get("/cache/stats")
 async def cache_stats():
     """Get Redis cache statistics"""
-    return get_cache().get_stats()
+    return await get_cache().get_stats()
 
 @app.post("/cache/clear")
 async def clear_cache():
-    """Clear all cache entries"""
-    get_cache().clear_all()
+    """Clear cached parses, PDFs and completions (sessions and render jobs are kept)"""
+    await get_cache().clear_all()
     return {"message": "Cache cleared"}
 
 @app.post("/parse")
 async def parse_resume(
+    request: Request,
     file: UploadFile = File(...), 
     api_key: str = Form(...),
     provider: str = Form("gemini"),
     model_name: str = Form("gemini-1.5-flash")
 ):
     print(f"DEBUG: Received parse request. Provider: {provider}, Model: {model_name}", flush=True)
+    # Hash the spooled upload in place, enforcing the size limit
+    try:
+        file_digest = await hash_upload(file, MAX_RESUME_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # Bounded by MAX_RESUME_UPLOAD_BYTES; parsing needs the bytes in memory
     content = await file.read()
-    filename = file.filename.lower()
-    
-    # Check cache first
-    cache = get_cache()
-    cached_data = cache.get_parsed_resume(content, provider, model_name)
-    if cached_data:
-        return Resume(**cached_data)
     
     try:
-        if filename.endswith(".pdf"):
-            resume = await parse_pdf(content, api_key, provider, model_name)
-        elif filename.endswith(".tex"):
-            resume = await parse_tex(content, api_key, provider, model_name)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Please upload PDF or LaTeX.")
-        
-        # Cache the parsed result
-        cache.set_parsed_resume(content, provider, model_name, resume.model_dump())
-        
-        # Save files asynchronously with proper error handling
-        try:
-            # Ensure directory exists
-            await aiofiles.os.makedirs(RESUME_DIR, exist_ok=True)
-            
-            # Save the original uploaded file
-            save_path = os.path.join(RESUME_DIR, filename)
-            async with aiofiles.open(save_path, "wb") as f:
-                await f.write(content)
-                
-            # Save the parsed JSON
-            json_filename = filename.rsplit(".", 1)[0] + ".json"
-            json_path = os.path.join(RESUME_DIR, json_filename)
-            async with aiofiles.open(json_path, "w") as f:
-                await f.write(resume.model_dump_json(indent=2))
-        except Exception as save_error:
-            print(f"Warning: Could not save files: {save_error}")
-            # Don't fail the request if save fails
-            
-        return resume
-    except HTTPException:
-        raise
+        # Cache lookup, extraction, local or LLM parse and library storage
+        return await run_cancellable(
+            parse_resume_file(file.filename, content, file_digest, api_key, provider, model_name),
+            request.is_disconnected
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/import", status_code=202)
+async def start_import(
+    file: UploadFile = File(...),
+    api_key: str = Form(...),
+    provider: str = Form("gemini"),
+    model_name: str = Form("gemini-1.5-flash")
+):
+    """Import a zip of PDF/TeX resumes in the background; poll /import/{job_id} for progress"""
+    if file.size is not None and file.size > MAX_IMPORT_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is {file.size} bytes; the limit is {MAX_IMPORT_UPLOAD_BYTES}")
+    try:
+        return await get_import_manager().start(file.file, api_key, provider, model_name)
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/import/{job_id}")
+async def get_import(job_id: str):
+    """Progress of a bulk import, with per-file status"""
+    progress = get_import_manager().get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
+@app.post("/import/{job_id}/resume", status_code=202)
+async def resume_import(
+    job_id: str,
+    api_key: str = Form(...),
+    provider: str = Form("gemini"),
+    model_name: str = Form("gemini-1.5-flash")
+):
+    """Restart an interrupted import; files already done are skipped"""
+    try:
+        progress = get_import_manager().resume(job_id, api_key, provider, model_name)
+    except ImportInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
 @app.post("/generate")
-async def generate_resume(resume: Resume):
+async def generate_resume(resume: Resume, session_id: Optional[str] = None):
+    """
+    Generate a PDF. Pass the editor's `session_id` (query parameter) so
+    successive edits recompile in the same work directory.
+    """
     try:
         # Check PDF cache
         cache = get_cache()
         resume_json = resume.model_dump_json()
-        cached_pdf = cache.get_generated_pdf(resume_json)
+        cached_pdf = await cache.get_generated_pdf(resume_json)
         
         if cached_pdf:
             return Response(
@@ -115,14 +191,18 @@ async def generate_resume(resume: Resume):
                 headers={"Content-Disposition": "attachment; filename=resume.pdf"}
             )
         
-        # Generate PDF
-        output_file = render_pdf(resume, "generated_resume.pdf")
+        async def render_and_cache():
+            # Generate PDF in an isolated render worker
+            rendered = await get_render_pool().render(resume, session_id)
+            await cache.set_generated_pdf(resume_json, rendered)
+            return rendered
         
-        # Read and cache the PDF
-        async with aiofiles.open(output_file, "rb") as f:
-            pdf_content = await f.read()
-        
-        cache.set_generated_pdf(resume_json, pdf_content)
+        # Identical concurrent renders share a single Tectonic run
+        pdf_content = await cache.single_flight(
+            cache.pdf_key(resume_json),
+            render_and_cache,
+            lambda: cache.get_generated_pdf(resume_json)
+        )
         
         return Response(
             content=pdf_content,
@@ -133,41 +213,224 @@ async def generate_resume(resume: Resume):
         print(f"PDF generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/preview", response_class=HTMLResponse)
+async def preview_resume(resume: Resume):
+    """Fast HTML preview for live editing; use /generate for the PDF export"""
+    return HTMLResponse(render_html(resume))
+
+class RenderJobRequest(BaseModel):
+    resume: Resume
+    priority: Literal["high", "normal", "low"] = "normal"
+    webhook_url: Optional[HttpUrl] = None
+    session_id: Optional[str] = None
+
+@app.post("/render/jobs", status_code=202)
+async def submit_render_job(request: RenderJobRequest):
+    """Queue a PDF render; poll /render/jobs/{job_id} or wait for the webhook"""
+    try:
+        webhook_url = str(request.webhook_url) if request.webhook_url else None
+        return await get_render_queue().submit(request.resume, request.priority, webhook_url, request.session_id)
+    except WebhookURLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+@app.get("/render/jobs/{job_id}")
+async def get_render_job(job_id: str):
+    """Get the status of a render job"""
+    job = await get_cache().get_render_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Render job not found or expired")
+    return job
+
+@app.get("/render/jobs/{job_id}/pdf")
+async def get_render_job_pdf(job_id: str):
+    """Download the PDF of a finished render job"""
+    cache = get_cache()
+    job = await cache.get_render_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Render job not found or expired")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Render job is {job['status']}")
+    
+    pdf_content = await cache.get_render_job_pdf(job_id)
+    if pdf_content is None:
+        raise HTTPException(status_code=404, detail="Render job result expired")
+    return Response(
+        content=pdf_content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": "attachment; filename=resume.pdf"}
+    )
+
 @app.post("/improve")
 async def improve_section(
+    request: Request,
     content: str = Body(...),
     job_description: str = Body(...),
     api_key: str = Body(...),
     provider: str = Body("gemini"),
-    model_name: str = Body("gemini-1.5-flash")
+    model_name: str = Body("gemini-1.5-flash"),
+    no_cache: bool = Body(False)
 ):
     try:
-        improved = await improve_resume_section(content, job_description, api_key, provider, model_name)
+        improved = await run_cancellable(
+            improve_resume_section(content, job_description, api_key, provider, model_name, use_cache=not no_cache),
+            request.is_disconnected
+        )
         return {"improved_content": improved}
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class ImproveBatchRequest(BaseModel):
+    resume: Resume
+    job_description: str
+    api_key: str
+    provider: str = "gemini"
+    model_name: str = "gemini-1.5-flash"
+    no_cache: bool = False
+
+@app.post("/improve/batch")
+async def improve_batch(request: ImproveBatchRequest, http_request: Request):
+    """Tailor the summary and all experience/project bullets to a job description in one round trip"""
+    try:
+        improved = await run_cancellable(
+            improve_resume(
+                request.resume,
+                request.job_description,
+                request.api_key,
+                request.provider,
+                request.model_name,
+                use_cache=not request.no_cache
+            ),
+            http_request.is_disconnected
+        )
+        return {"resume": improved}
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class ChatRequest(BaseModel):
-    current_resume: dict
-    chat_history: list
+    # Stateless mode: the client sends the whole resume and history every turn
+    current_resume: Optional[dict] = None
+    chat_history: Optional[list] = None
+    # Session mode: the server keeps both; the client sends only its own edits
+    session_id: Optional[str] = None
+    resume_patch: Optional[dict] = None
     user_message: str
     api_key: str
     provider: str = "gemini"
     model_name: str = "gemini-1.5-flash"
+    # Skip the completion cache (e.g. to regenerate an answer); ignored by /chat/stream
+    no_cache: bool = False
+
+class ChatSessionRequest(BaseModel):
+    current_resume: dict
+
+async def _chat_context(request: ChatRequest):
+    """Resolve the resume, history and session (if any) for a chat turn"""
+    if request.session_id is None:
+        if request.current_resume is None:
+            raise HTTPException(status_code=400, detail="current_resume is required without a session_id")
+        return request.current_resume, request.chat_history or [], None
+    
+    try:
+        session = await load_session(request.session_id)
+        session["resume"] = apply_patch(session["resume"], request.resume_patch)
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return session["resume"], session["history"], session
+
+@app.post("/chat/sessions")
+async def create_chat_session(request: ChatSessionRequest):
+    """Start a server-side chat session for a resume"""
+    session_id = await create_session(request.current_resume)
+    return {"session_id": session_id}
+
+@app.get("/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str):
+    """Get the resume and history held by a chat session"""
+    try:
+        return await load_session(session_id)
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    current_resume, chat_history, session = await _chat_context(request)
     try:
-        response_message = await chat_with_resume(
-            request.current_resume,
-            request.chat_history,
+        response_message = await run_cancellable(
+            chat_with_resume(
+                current_resume,
+                chat_history,
+                request.user_message,
+                request.api_key,
+                request.provider,
+                request.model_name,
+                use_cache=not request.no_cache
+            ),
+            http_request.is_disconnected
+        )
+        if session is None:
+            return {"message": response_message}
+        
+        resume_diff = await record_turn(request.session_id, session, request.user_message, response_message)
+        return {"message": response_message, "session_id": request.session_id, "resume_diff": resume_diff}
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: dict) -> str:
+    """Format an event as a Server-Sent Events frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat over Server-Sent Events.
+    Frames are produced only as fast as the client reads them, and the upstream
+    LLM stream is closed as soon as the client disconnects.
+    """
+    current_resume, chat_history, session = await _chat_context(request)
+    
+    async def event_stream():
+        events = stream_chat_with_resume(
+            current_resume,
+            chat_history,
             request.user_message,
             request.api_key,
             request.provider,
             request.model_name
         )
-        return {"message": response_message}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        async with aclosing(events):
+            try:
+                async for event in events:
+                    if await http_request.is_disconnected():
+                        print("DEBUG: Client disconnected, closed chat stream", flush=True)
+                        return
+                    yield _sse(event)
+                    if event["type"] == "done" and session is not None:
+                        resume_diff = await record_turn(request.session_id, session, request.user_message, event["message"])
+                        yield _sse({"type": "session", "session_id": request.session_id, "resume_diff": resume_diff})
+            except Exception as e:
+                yield _sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Resume Management Endpoints
 
@@ -179,20 +442,20 @@ async def upload_logo(file: UploadFile = File(...)):
         if not file.content_type in ["image/png", "image/jpeg", "image/jpg"]:
             raise HTTPException(status_code=400, detail="Only PNG and JPEG images are supported")
         
-        # Ensure directory exists
-        await aiofiles.os.makedirs(LOGO_DIR, exist_ok=True)
-        
-        # Generate safe filename
-        file_extension = file.filename.split(".")[-1]
-        safe_filename = f"logo_{os.urandom(8).hex()}.{file_extension}"
-        file_path = os.path.join(LOGO_DIR, safe_filename)
-        
-        # Save the file asynchronously
+        # Hash the spooled upload in place, enforcing the size limit
+        try:
+            file_digest = await hash_upload(file, MAX_LOGO_UPLOAD_BYTES)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         content = await file.read()
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(content)
         
-        return {"logo_path": file_path, "filename": safe_filename}
+        # Downscaled, re-encoded and named by content hash; repeat uploads reuse the file
+        try:
+            file_path = await store_logo(content, file_digest)
+        except LogoError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {"logo_path": file_path, "filename": os.path.basename(file_path)}
     except HTTPException:
         raise
     except Exception as e:
@@ -202,13 +465,19 @@ class SaveRequest(BaseModel):
     filename: str
     resume_data: dict
 
+# Background thumbnail pre-renders, referenced until done so they aren't garbage collected
+_thumbnail_tasks = set()
+
+async def _prerender_thumbnail(pdf_path: str):
+    try:
+        await get_thumbnail(pdf_path)
+    except Exception as e:
+        print(f"⚠️ Thumbnail pre-render failed for {pdf_path}: {e}")
+
 @app.post("/save-version")
 async def save_version(request: SaveRequest):
     """Save resume version with improved error handling"""
     try:
-        # Ensure directory exists
-        await aiofiles.os.makedirs(RESUME_DIR, exist_ok=True)
-        
         # Sanitize filename
         base_name = request.filename.replace(" ", "_").replace("/", "_").replace("\\", "_")
         base_name = "".join(c for c in base_name if c.isalnum() or c in "._-")
@@ -220,21 +489,30 @@ async def save_version(request: SaveRequest):
             json_filename = f"{base_name}.json"
         else:
             json_filename = base_name
-            
-        json_path = os.path.join(RESUME_DIR, json_filename)
         
-        # Save JSON asynchronously
-        json_content = json.dumps(request.resume_data, indent=2)
-        async with aiofiles.open(json_path, "w") as f:
-            await f.write(json_content)
+        # Store the JSON (a no-op on disk when this content was saved before)
+        library = get_library()
+        json_entry = await library.put(json_filename, canonical_json(request.resume_data), resume=request.resume_data)
             
         # Generate and save PDF
         pdf_filename = json_filename.replace(".json", ".pdf")
-        pdf_path = os.path.join(RESUME_DIR, pdf_filename)
         
         try:
-            resume_obj = Resume(**request.resume_data)
-            render_pdf(resume_obj, pdf_path)
+            pdf_hash = await library.rendered_pdf(json_entry["content_hash"], TEMPLATE_HASH)
+            if pdf_hash is not None:
+                # Same resume content and templates as an earlier save: share its PDF, skip the render
+                pdf_entry = await library.link(pdf_filename, pdf_hash, resume=request.resume_data)
+            else:
+                resume_obj = Resume(**request.resume_data)
+                pdf_content = await get_render_pool().render(resume_obj)
+                # Library copies carry their source so re-uploads parse exactly
+                pdf_content = await run_fitz(attach_source, pdf_content, resume_obj)
+                pdf_entry = await library.put(pdf_filename, pdf_content, resume=request.resume_data)
+                await library.record_render(json_entry["content_hash"], pdf_entry["content_hash"], TEMPLATE_HASH)
+            # Pre-render the default thumbnail so the library view never waits on it
+            task = asyncio.create_task(_prerender_thumbnail(library.blob_path(pdf_entry["content_hash"])))
+            _thumbnail_tasks.add(task)
+            task.add_done_callback(_thumbnail_tasks.discard)
         except Exception as pdf_error:
             print(f"PDF generation failed: {pdf_error}")
             # Return success for JSON save even if PDF fails
@@ -250,27 +528,42 @@ async def save_version(request: SaveRequest):
         raise HTTPException(status_code=500, detail=f"Save failed: {str(e)}")
 
 @app.get("/resumes")
-async def list_resumes():
+async def list_resumes(
+    offset: int = 0,
+    limit: Optional[int] = None,
+    sort: str = "name",
+    order: str = "asc",
+    q: Optional[str] = None,
+    kind: Optional[str] = None
+):
+    """
+    List saved resumes from the library index. Pass `limit` (and `offset`) to
+    page through them; without a limit every match is returned, as before paging.
+    `files` keeps the plain name list; `items` carries the indexed metadata.
+    Only .json and .pdf files are listed unless `kind` (e.g. "tex") is given.
+    """
     try:
-        files = []
-        # Ensure directory exists
-        await aiofiles.os.makedirs(RESUME_DIR, exist_ok=True)
-        
-        if os.path.exists(RESUME_DIR):
-            for f in os.listdir(RESUME_DIR):
-                if f.endswith(".pdf") or f.endswith(".json"):
-                    files.append(f)
-        return {"files": sorted(files)}
+        items, total = await get_library().list(offset, limit, sort, order, q, kind)
+        return {
+            "files": [item["name"] for item in items],
+            "items": items,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/resumes/{filename}")
-async def get_resume(filename: str):
+async def get_resume(filename: str, version: Optional[int] = None):
+    """Get a saved file; `version` selects an earlier version from its history"""
     # Sanitize filename to prevent path traversal
     safe_filename = os.path.basename(filename)
-    file_path = os.path.join(RESUME_DIR, safe_filename)
+    file_path = await get_library().resolve(safe_filename, version)
     
-    if not os.path.exists(file_path):
+    if file_path is None:
         raise HTTPException(status_code=404, detail="File not found")
     
     if filename.endswith(".json"):
@@ -278,27 +571,54 @@ async def get_resume(filename: str):
             content = await f.read()
             return json.loads(content)
     else:
-        return FileResponse(file_path)
+        # Blobs have no extension; serve them under their library name
+        media_type = mimetypes.guess_type(safe_filename)[0] or "application/octet-stream"
+        return FileResponse(file_path, media_type=media_type, filename=safe_filename, content_disposition_type="inline")
+
+@app.get("/resumes/{filename}/versions")
+async def get_resume_versions(filename: str):
+    """Version history of a saved file, newest first"""
+    safe_filename = os.path.basename(filename)
+    versions = await get_library().history(safe_filename)
+    if not versions:
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"name": safe_filename, "versions": versions}
+
+@app.get("/resumes/{filename}/thumbnail")
+async def get_resume_thumbnail(filename: str, request: Request, page: int = 0, width: int = DEFAULT_THUMBNAIL_WIDTH):
+    """PNG thumbnail of a saved resume's PDF page (a .json name maps to its PDF)"""
+    safe_filename = os.path.basename(filename)
+    if safe_filename.endswith(".json"):
+        safe_filename = safe_filename[:-len(".json")] + ".pdf"
+    pdf_path = await get_library().resolve(safe_filename) if safe_filename.endswith(".pdf") else None
+    if pdf_path is None:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    
+    try:
+        png_path, content_hash = await get_thumbnail(pdf_path, page, width)
+    except ThumbnailError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    etag = f'"{content_hash}-p{page}-w{width}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(png_path, media_type="image/png", headers=headers)
 
 @app.delete("/resumes/{filename}")
 async def delete_resume(filename: str):
     try:
         # Sanitize filename
         safe_filename = os.path.basename(filename)
-        file_path = os.path.join(RESUME_DIR, safe_filename)
+        names = [safe_filename]
         
-        if os.path.exists(file_path):
-            await aiofiles.os.remove(file_path)
-            
-        # Also try to delete associated PDF/JSON if it exists
-        if filename.endswith(".json"):
-            pdf_path = file_path.replace(".json", ".pdf")
-            if os.path.exists(pdf_path):
-                await aiofiles.os.remove(pdf_path)
-        elif filename.endswith(".pdf"):
-            json_path = file_path.replace(".pdf", ".json")
-            if os.path.exists(json_path):
-                await aiofiles.os.remove(json_path)
+        # Also delete the associated PDF/JSON if it exists
+        base, ext = os.path.splitext(safe_filename)
+        if ext in (".json", ".pdf"):
+            names.append(base + (".pdf" if ext == ".json" else ".json"))
+        
+        # Removes the names with their history; blobs are deleted once nothing references them
+        await get_library().remove(*names)
                 
         return {"message": "Deleted successfully"}
     except Exception as e:
@@ -310,8 +630,9 @@ class RenameRequest(BaseModel):
 @app.put("/resumes/{filename}")
 async def rename_resume(filename: str, request: RenameRequest):
     try:
-        old_path = os.path.join(RESUME_DIR, filename)
-        if not os.path.exists(old_path):
+        filename = os.path.basename(filename)
+        library = get_library()
+        if await library.get(filename) is None:
             raise HTTPException(status_code=404, detail="File not found")
             
         new_name = request.new_filename
@@ -321,16 +642,18 @@ async def rename_resume(filename: str, request: RenameRequest):
         elif filename.endswith(".pdf") and not new_name.endswith(".pdf"):
             new_name += ".pdf"
             
-        new_path = os.path.join(RESUME_DIR, new_name)
-        os.rename(old_path, new_path)
+        new_name = os.path.basename(new_name)
+        await library.rename(filename, new_name)
         
         # Rename associated file if exists
         if filename.endswith(".json"):
-            old_pdf = old_path.replace(".json", ".pdf")
-            new_pdf = new_path.replace(".json", ".pdf")
-            if os.path.exists(old_pdf):
-                os.rename(old_pdf, new_pdf)
+            old_pdf = filename[:-len(".json")] + ".pdf"
+            new_pdf = new_name[:-len(".json")] + ".pdf"
+            if await library.get(old_pdf) is not None:
+                await library.rename(old_pdf, new_pdf)
                 
         return {"message": "Renamed successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,25 +1,145 @@
-import fitz  # PyMuPDF
+import os
+import re
+import unicodedata
+from typing import Optional
 from models import Resume
 from ai_engine import parse_resume_text
+import pdf_text
+from cache import get_cache
+from library import canonical_json, get_library
+from uploads import check_pdf_pages, InvalidUploadError
+from local_parser import parse_pdf_locally, parse_tex_locally, LOCAL_PARSE_MIN_CONFIDENCE
 
-async def parse_pdf(file_content: bytes, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash") -> Resume:
+# LaTeX comments: an unescaped % up to the end of the line
+_LATEX_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_WHITESPACE_RE = re.compile(r"\s+")
+# Zero-width and BOM characters some exporters sprinkle into text
+_INVISIBLE_RE = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+
+async def extract_pdf_text(file_content: bytes, layout: Optional[bool] = None) -> str:
+    """
+    Extracts the visible text from a PDF. Document metadata is not included.
+    Pages are extracted off the event loop (in parallel for long PDFs); pass
+    `layout=True` to keep block/column structure (default: PDF_LAYOUT_TEXT).
+    """
+    return await pdf_text.extract_text(file_content, layout)
+
+def extract_tex_text(file_content: bytes) -> str:
+    """
+    Decodes LaTeX source.
+    """
+    return file_content.decode("utf-8")
+
+def normalize_text(text: str, is_tex: bool = False) -> str:
+    """
+    Normalizes extracted text for content-based cache keys, so byte-different
+    exports of the same resume (metadata, timestamps, ligatures, spacing) match.
+    """
+    if is_tex:
+        text = _LATEX_COMMENT_RE.sub("", text)
+    text = unicodedata.normalize("NFKC", text)
+    text = _INVISIBLE_RE.sub("", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+async def parse_pdf(file_content: bytes, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", text: Optional[str] = None) -> Resume:
     """
     Extracts text from PDF and uses AI to structure it.
+    PDFs the local parser reads with high confidence skip the LLM entirely.
+    Pass `text` to reuse text that was already extracted.
     """
-    doc = fitz.open(stream=file_content, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    
+    resume, confidence = await pdf_text.run_fitz(parse_pdf_locally, file_content)
+    if resume is not None and confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        print(f"⚡ Parsed PDF locally (confidence {confidence:.2f}), skipping LLM", flush=True)
+        return resume
+    print(f"DEBUG: Local PDF parse confidence {confidence:.2f}, using LLM", flush=True)
+
+    if text is None:
+        text = await extract_pdf_text(file_content)
+
     # Use AI to structure the text
     resume = await parse_resume_text(text, api_key, provider, model_name)
     return resume
 
-async def parse_tex(file_content: bytes, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash") -> Resume:
+async def parse_tex(file_content: bytes, api_key: str, provider: str = "gemini", model_name: str = "gemini-1.5-flash", text: Optional[str] = None) -> Resume:
     """
     Extracts text from LaTeX and uses AI to structure it.
+    Sources using our template macros skip the LLM when parsed with high confidence.
+    Pass `text` to reuse text that was already extracted.
     """
-    text = file_content.decode("utf-8")
+    if text is None:
+        text = extract_tex_text(file_content)
+
+    resume, confidence = parse_tex_locally(text)
+    if resume is not None and confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        print(f"⚡ Parsed LaTeX locally (confidence {confidence:.2f}), skipping LLM", flush=True)
+        return resume
+    print(f"DEBUG: Local LaTeX parse confidence {confidence:.2f}, using LLM", flush=True)
     # Use AI to structure the text (AI is good at understanding LaTeX too)
     resume = await parse_resume_text(text, api_key, provider, model_name)
     return resume
+
+async def _parse_uncached(filename: str, content: bytes, sha256: str, api_key: str, provider: str, model_name: str) -> dict:
+    """Extract and parse a file missing from the byte-digest cache; returns the resume data"""
+    cache = get_cache()
+    if filename.endswith(".pdf"):
+        parse_file = parse_pdf
+        # Reject unreadable or overlong PDFs before any extraction or LLM call
+        await pdf_text.run_fitz(check_pdf_pages, content)
+        # Off the event loop, in parallel for long PDFs
+        text = await extract_pdf_text(content)
+    else:
+        parse_file = parse_tex
+        text = extract_tex_text(content)
+
+    # Re-exports of the same resume differ in bytes but not in content
+    normalized_text = normalize_text(text, is_tex=filename.endswith(".tex"))
+    cached_data = await cache.get_parsed_resume_by_text(normalized_text, provider, model_name)
+    if cached_data:
+        await cache.set_parsed_resume(sha256, provider, model_name, cached_data)
+        return cached_data
+
+    async def parse_and_cache():
+        parsed = await parse_file(content, api_key, provider, model_name, text=text)
+        resume_data = parsed.model_dump()
+        # Cache the parsed result under both the file hash and the content hash
+        await cache.set_parsed_resume(sha256, provider, model_name, resume_data)
+        await cache.set_parsed_resume_by_text(normalized_text, provider, model_name, resume_data)
+        return resume_data
+
+    # Concurrent uploads of the same content share a single LLM parse
+    return await cache.single_flight(
+        cache.parsed_text_key(normalized_text, provider, model_name),
+        parse_and_cache,
+        lambda: cache.get_parsed_resume_by_text(normalized_text, provider, model_name)
+    )
+
+
+async def parse_resume_file(filename: str, content: bytes, sha256: str, api_key: str, provider: str, model_name: str) -> Resume:
+    """
+    Parse one resume file and store it (plus its JSON) in the library.
+    `sha256` is the content's hex digest, used for the parse cache and the blob store.
+    Raises InvalidUploadError for unsupported or unreadable files.
+    """
+    filename = os.path.basename(filename.lower())
+    if not filename.endswith((".pdf", ".tex")):
+        raise InvalidUploadError("Unsupported file type. Please upload PDF or LaTeX.")
+
+    cached_data = await get_cache().get_parsed_resume(sha256, provider, model_name)
+    if not cached_data:
+        cached_data = await _parse_uncached(filename, content, sha256, api_key, provider, model_name)
+    resume = Resume(**cached_data)
+
+    # Store the upload and the parsed JSON, cache hits included. The library is
+    # content-addressed, so re-uploads cost no disk writes and same-named uploads
+    # become new versions.
+    try:
+        library = get_library()
+        json_filename = filename.rsplit(".", 1)[0] + ".json"
+        resume_dict = resume.model_dump()
+        await library.put(json_filename, canonical_json(resume_dict), resume=resume_dict)
+        await library.put(filename, content, sha256=sha256)
+    except Exception as save_error:
+        print(f"Warning: Could not save files: {save_error}")
+        # Don't fail the request if save fails
+
+    return resume
@@ -0,0 +1,133 @@
+"""
+PDF text extraction for Adaptive-CV
+Extraction runs off the event loop: short PDFs on the fitz thread, long ones
+split into page ranges across worker processes, each opening its own copy of
+the document. Kept free of heavy imports so the spawned workers start quickly.
+
+PyMuPDF does not support concurrent use from several threads, so all
+in-process fitz work in the app (extraction, local parsing, page checks,
+thumbnails, logos, PDF attachments) goes through run_fitz, which runs it on
+one dedicated thread. Worker processes are separate interpreters and are safe.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import fitz  # PyMuPDF
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 2)))
+# PDFs up to this many pages are extracted on the fitz thread; IPC isn't worth it below that
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 4))
+# Keep block/column structure in the extracted text (see _layout_text)
+PDF_LAYOUT_TEXT = os.getenv("PDF_LAYOUT_TEXT", "false").lower() == "true"
+
+# Blocks narrower than this fraction of the page can belong to a column
+_COLUMN_MAX_WIDTH = 0.6
+
+_executor: Optional[ProcessPoolExecutor] = None
+# The one thread allowed to call into PyMuPDF in this process
+_fitz_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fitz")
+
+
+async def run_fitz(fn, *args):
+    """Run blocking PyMuPDF work on the dedicated fitz thread"""
+    return await asyncio.get_running_loop().run_in_executor(_fitz_thread, functools.partial(fn, *args))
+
+
+def _layout_text(page) -> str:
+    """
+    Page text as blank-line separated blocks in reading order. Two-column
+    regions are emitted column by column instead of interleaved line by line;
+    full-width blocks (headings, rules) split the page into such regions.
+    """
+    middle = page.rect.x0 + page.rect.width / 2
+    max_column_width = page.rect.width * _COLUMN_MAX_WIDTH
+    blocks = [b for b in page.get_text("blocks", sort=True) if b[6] == 0 and b[4].strip()]
+
+    parts = []
+    left, right = [], []
+    for x0, y0, x1, y1, text, *_ in blocks:
+        if x1 - x0 <= max_column_width and x1 <= middle:
+            left.append(text.strip())
+        elif x1 - x0 <= max_column_width and x0 >= middle:
+            right.append(text.strip())
+        else:
+            parts.extend(left + right)
+            left, right = [], []
+            parts.append(text.strip())
+    parts.extend(left + right)
+    return "\n\n".join(parts) + "\n"
+
+
+def _extract_range(file_content: bytes, start: int, stop: int, layout: bool) -> List[Tuple[int, str, float]]:
+    """Extract pages [start, stop) as (page number, text, seconds); runs in a worker"""
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        pages = []
+        for number in range(start, stop):
+            started = time.perf_counter()
+            page = doc[number]
+            text = _layout_text(page) if layout else page.get_text()
+            pages.append((number, text, time.perf_counter() - started))
+        return pages
+    finally:
+        doc.close()
+
+
+def _page_count(file_content: bytes) -> int:
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the server process has threads (thread pool, cache, etc.)
+        _executor = ProcessPoolExecutor(PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def close_extractor():
+    """Shut down the extraction worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def extract_pages(file_content: bytes, layout: Optional[bool] = None) -> List[dict]:
+    """
+    Extract every page's text without blocking the event loop.
+    Returns [{"page", "text", "seconds"}] in page order.
+    """
+    layout = PDF_LAYOUT_TEXT if layout is None else layout
+    page_count = await run_fitz(_page_count, file_content)
+
+    if page_count <= PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+        pages = await run_fitz(_extract_range, file_content, 0, page_count, layout)
+    else:
+        loop = asyncio.get_running_loop()
+        chunk = -(-page_count // PDF_EXTRACT_WORKERS)
+        ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(_get_executor(), _extract_range, file_content, start, stop, layout)
+            for start, stop in ranges
+        ])
+        pages = [page for result in results for page in result]
+
+    return [{"page": number, "text": text, "seconds": seconds} for number, text, seconds in pages]
+
+
+async def extract_text(file_content: bytes, layout: Optional[bool] = None) -> str:
+    """Extract a PDF's visible text off the event loop, logging per-page timing"""
+    started = time.perf_counter()
+    pages = await extract_pages(file_content, layout)
+    timings = ", ".join(f"p{page['page'] + 1} {page['seconds'] * 1000:.1f}ms" for page in pages)
+    print(f"📄 Extracted {len(pages)} PDF pages in {(time.perf_counter() - started) * 1000:.1f}ms ({timings})", flush=True)
+    return "".join(page["text"] for page in pages)
@@ -0,0 +1,119 @@
+"""
+Prompt compaction and token budgeting for Adaptive-CV LLM calls
+Shrinks what we send (minified JSON, stripped LaTeX, deduplicated whitespace)
+and keeps chat history within a per-call token budget
+"""
+import json
+import os
+import re
+from typing import Any, List
+from litellm import token_counter
+
+# Token budget for prior chat turns included in each chat prompt
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 4000))
+# Dropped turns are replaced by a note listing at most this many earlier user requests
+HISTORY_SUMMARY_MAX_REQUESTS = 8
+
+_LATEX_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_LATEX_LAYOUT_RE = re.compile(r"\\(?:vspace|hspace)\*?\{[^{}]*\}")
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_INLINE_SPACE_RE = re.compile(r"[ \t]{2,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_PAGE_NUMBER_RE = re.compile(r"^\s*(?:Page\s+)?\d+\s*(?:of|/)\s*\d+\s*$", re.MULTILINE | re.IGNORECASE)
+
+
+def _prune(value: Any) -> Any:
+    """Drop None, empty strings and empty collections"""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_prune(item) for item in value if item not in (None, "", [], {})]
+    return value
+
+
+def compact_json(data: Any) -> str:
+    """Minified JSON without empty fields"""
+    return json.dumps(_prune(data), separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_schema(schema: Any) -> Any:
+    """Drop the auto-generated `title` keys Pydantic adds to every JSON schema node"""
+    if isinstance(schema, dict):
+        return {
+            key: compact_schema(value)
+            for key, value in schema.items()
+            if not (key == "title" and isinstance(value, str))
+        }
+    if isinstance(schema, list):
+        return [compact_schema(item) for item in schema]
+    return schema
+
+
+def compact_text(text: str) -> str:
+    """Deduplicate whitespace; safe for text the user typed"""
+    text = _TRAILING_SPACE_RE.sub("", text)
+    text = _INLINE_SPACE_RE.sub(" ", text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def compact_latex(source: str) -> str:
+    """Strip the preamble, comments and spacing commands from LaTeX source"""
+    begin = source.find("\\begin{document}")
+    if begin != -1:
+        source = source[begin + len("\\begin{document}"):]
+    source = source.split("\\end{document}")[0]
+    source = _LATEX_COMMENT_RE.sub("", source)
+    source = _LATEX_LAYOUT_RE.sub("", source)
+    return compact_text(source)
+
+
+def compact_resume_source(text: str) -> str:
+    """Compact uploaded resume text, LaTeX or extracted PDF text, dropping page-number boilerplate"""
+    text = _PAGE_NUMBER_RE.sub("", text)
+    if "\\begin{document}" in text or "\\section" in text:
+        return compact_latex(text)
+    return compact_text(text)
+
+
+def count_tokens(model: str, messages: List[dict]) -> int:
+    """Count prompt tokens with the model's tokenizer, estimating when it is unknown"""
+    try:
+        return token_counter(model=model, messages=messages)
+    except Exception:
+        return sum(len(str(message.get("content") or "")) for message in messages) // 4
+
+
+def trim_history(history: List[dict], model: str, budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> List[dict]:
+    """
+    Keep the most recent turns that fit in `budget` tokens.
+    Older turns are replaced by a short note listing what the user asked for.
+    """
+    kept: List[dict] = []
+    used = 0
+    for message in reversed(history):
+        tokens = count_tokens(model, [message])
+        if used + tokens > budget:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    # A tool result cannot open the history without the assistant call that produced it
+    while kept and kept[0].get("role") == "tool":
+        kept.pop(0)
+
+    dropped = history[:len(history) - len(kept)]
+    if not dropped:
+        return kept
+
+    requests = [
+        str(message.get("content") or "")[:80]
+        for message in dropped
+        if message.get("role") == "user" and message.get("content")
+    ][-HISTORY_SUMMARY_MAX_REQUESTS:]
+    note = f"[{len(dropped)} earlier messages omitted."
+    if requests:
+        note += " Earlier user requests: " + "; ".join(requests)
+    note += "]"
+    print(f"DEBUG: Trimmed {len(dropped)} chat messages to fit {budget} token budget", flush=True)
+    return [{"role": "system", "content": note}] + kept
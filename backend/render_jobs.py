@@ -0,0 +1,199 @@
+"""
+Asynchronous render jobs for Adaptive-CV
+Renders are queued per worker and compiled in the background; job state and the
+resulting PDF live in the cache (Redis, or memory without it), so clients poll
+for the result or get a webhook instead of holding a connection open
+"""
+import asyncio
+import ipaddress
+import itertools
+import os
+import time
+import uuid
+from urllib.parse import urlsplit
+from typing import Optional
+import httpx
+from models import Resume
+from cache import get_cache
+from renderer import get_render_pool, RENDER_WORKERS
+
+# Admission control: max jobs waiting in this worker's queue
+RENDER_QUEUE_MAX_PENDING = int(os.getenv("RENDER_QUEUE_MAX_PENDING", 100))
+WEBHOOK_TIMEOUT = 10
+# Webhooks to private, loopback and link-local addresses are refused (SSRF);
+# set to true for local development against a webhook on this machine
+RENDER_WEBHOOK_ALLOW_PRIVATE = os.getenv("RENDER_WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"
+
+# Lower runs first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    """Raised when the render queue cannot accept more jobs"""
+
+
+class WebhookURLError(ValueError):
+    """Raised when a webhook URL is not an http(s) URL on a public address"""
+
+
+async def check_webhook_url(url: str):
+    """
+    Refuse webhook URLs that are not http(s) or whose host resolves to a
+    non-public address. Checked on submit and again right before sending, since
+    DNS can change in between (a rebind after the last check is not caught).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise WebhookURLError("Webhook URL must be an http(s) URL")
+    if RENDER_WEBHOOK_ALLOW_PRIVATE:
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    except OSError as e:
+        raise WebhookURLError(f"Cannot resolve webhook host {parts.hostname}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            raise WebhookURLError(f"Webhook host {parts.hostname} resolves to a non-public address")
+
+
+class RenderJobQueue:
+    """Priority queue of render jobs drained by a fixed set of background consumers"""
+
+    def __init__(self, max_pending: int = RENDER_QUEUE_MAX_PENDING, consumers: int = RENDER_WORKERS):
+        self.max_pending = max_pending
+        self.consumers = max(1, consumers)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._sequence = itertools.count()
+        self._webhooks = set()
+        self._submitted = 0
+        self._rejected = 0
+
+    def start(self):
+        """Start the consumers (idempotent)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+        print(f"✅ Render job queue started ({self.consumers} consumers)")
+
+    async def stop(self):
+        """Stop the consumers; queued jobs are abandoned and expire with their state"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, resume: Resume, priority: str = "normal", webhook_url: Optional[str] = None, session_id: Optional[str] = None) -> dict:
+        """
+        Queue a render and return the new job's state. `session_id` is passed on to RenderPool.render.
+        Raises WebhookURLError for webhooks that are not public http(s) URLs.
+        """
+        if webhook_url:
+            await check_webhook_url(webhook_url)
+        self.start()
+        if self._queue.qsize() >= self.max_pending:
+            self._rejected += 1
+            raise QueueFullError(f"Render queue is full ({self.max_pending} pending jobs)")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "priority": priority,
+            "webhook_url": webhook_url,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        self._submitted += 1
+
+        # Already rendered: finish immediately without queueing
+        cache = get_cache()
+        pdf_content = await cache.get_generated_pdf(resume.model_dump_json())
+        if pdf_content is not None:
+            await self._finish(job, pdf_content=pdf_content)
+            return job
+
+        await cache.set_render_job(job["job_id"], job)
+        self._queue.put_nowait((PRIORITIES[priority], next(self._sequence), job, resume, session_id))
+        return job
+
+    async def _consume(self):
+        """Render queued jobs one at a time"""
+        while True:
+            _, _, job, resume, session_id = await self._queue.get()
+            try:
+                await self._run(job, resume, session_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Render job {job['job_id']} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: dict, resume: Resume, session_id: Optional[str] = None):
+        """Render one job and record the outcome"""
+        cache = get_cache()
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        await cache.set_render_job(job["job_id"], job)
+
+        try:
+            pdf_content = await get_render_pool().render(resume, session_id)
+        except Exception as e:
+            print(f"PDF generation error in job {job['job_id']}: {e}")
+            await self._finish(job, error=str(e))
+            return
+
+        await cache.set_generated_pdf(resume.model_dump_json(), pdf_content)
+        await self._finish(job, pdf_content=pdf_content)
+
+    async def _finish(self, job: dict, pdf_content: Optional[bytes] = None, error: Optional[str] = None):
+        """Store the final state (and PDF), then fire the webhook if one was given"""
+        cache = get_cache()
+        if pdf_content is not None:
+            await cache.set_render_job_pdf(job["job_id"], pdf_content)
+        job["status"] = "failed" if error else "done"
+        job["error"] = error
+        job["finished_at"] = time.time()
+        await cache.set_render_job(job["job_id"], job)
+
+        if job["webhook_url"]:
+            task = asyncio.create_task(self._notify(job))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+    async def _notify(self, job: dict):
+        """POST the final job state to its webhook; failures are logged, not retried"""
+        try:
+            await check_webhook_url(job["webhook_url"])
+            # Redirects are not followed, so a public URL cannot bounce to an internal one
+            async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, follow_redirects=False) as client:
+                response = await client.post(job["webhook_url"], json=job)
+                response.raise_for_status()
+        except Exception as e:
+            print(f"⚠️ Webhook for render job {job['job_id']} failed: {e}")
+
+    def get_stats(self) -> dict:
+        """Get queue depth and admission counters"""
+        return {
+            "consumers": self.consumers,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.max_pending,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+        }
+
+
+# Global render job queue instance
+_render_queue: Optional[RenderJobQueue] = None
+
+
+def get_render_queue() -> RenderJobQueue:
+    """Get the global render job queue instance"""
+    global _render_queue
+    if _render_queue is None:
+        _render_queue = RenderJobQueue()
+    return _render_queue
@@ -1,11 +1,25 @@
+import asyncio
+import base64
+import hashlib
+import json
 import os
-import subprocess
-from jinja2 import Environment, FileSystemLoader
+import shutil
+import tempfile
+import time
+import uuid
+from functools import lru_cache
+from collections import OrderedDict, deque
+from typing import Optional
+import fitz  # PyMuPDF
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from models import Resume
+from logos import LOGO_DIR
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 
 # Configure Jinja2 to use LaTeX-friendly delimiters
 latex_jinja_env = Environment(
-    loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")),
+    loader=FileSystemLoader(TEMPLATE_DIR),
     block_start_string='\BLOCK{',
     block_end_string='}',
     variable_start_string='\VAR{',
@@ -27,29 +41,436 @@ def latex_escape(value):
 
 latex_jinja_env.filters['escape_tex'] = latex_escape
 
-def render_pdf(resume: Resume, output_filename: str = "resume.pdf") -> str:
-    """
-    Renders the resume to PDF using Tectonic.
-    Returns the path to the generated PDF.
-    """
-    template = latex_jinja_env.get_template("resume.tex")
-    tex_content = template.render(resume=resume)
-    
-    # Save .tex file
-    tex_filename = output_filename.replace(".pdf", ".tex")
-    with open(tex_filename, "w") as f:
-        f.write(tex_content)
-    
-    # Compile with Tectonic
-    # Assuming tectonic is in the current directory or path
+# HTML live preview: same layout as resume.tex, rendered without Tectonic
+html_jinja_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+def _safe_url(value):
+    """Only let http(s) links through to the preview"""
+    if value and value.lower().startswith(("http://", "https://")):
+        return value
+    return "#"
+
+html_jinja_env.filters['safe_url'] = _safe_url
+
+# Section fragment cache: rendered LaTeX per section, keyed by the section's content hash
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", 4096))
+_sections = latex_jinja_env.get_template("sections.tex").module
+_fragment_cache: "OrderedDict[str, str]" = OrderedDict()
+_fragment_hits = 0
+_fragment_misses = 0
+
+# Render pool configuration
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 2))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 60))
+RENDER_SCRATCH_DIR = os.getenv("RENDER_SCRATCH_DIR") or None  # Defaults to the system temp dir
+# Persistent work directories kept per editing session, so recompiles reuse .aux and friends
+RENDER_SESSION_DIRS = int(os.getenv("RENDER_SESSION_DIRS", 32))
+
+# Warm engine configuration
+# The static preamble (templates/preamble.tex) is compiled once at startup so the
+# Tectonic bundle and format file land in a local cache; later renders run offline.
+TECTONIC_HOME = os.getenv("TECTONIC_HOME", os.path.join(os.path.dirname(__file__), ".tectonic"))
+TECTONIC_CACHE_DIR = os.path.join(TECTONIC_HOME, "cache")
+PREAMBLE_PATH = os.path.join(TEMPLATE_DIR, "preamble.tex")
+_WARM_MARKER = os.path.join(TECTONIC_HOME, "warm")
+
+
+# Logos are only ever read from LOGO_DIR, whatever path the resume carries
+LOGO_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Name of the PDF attachment holding the source Resume JSON
+SOURCE_ATTACHMENT = "adaptive-cv-resume.json"
+
+
+class RenderError(Exception):
+    """Raised when Tectonic fails to compile a resume"""
+
+
+def _tectonic_path() -> str:
+    """Locate the Tectonic binary (bundled next to this file or on PATH)"""
     tectonic_path = os.path.join(os.path.dirname(__file__), "tectonic")
     if not os.path.exists(tectonic_path):
         tectonic_path = "tectonic" # Try system path
-        
+    return tectonic_path
+
+
+def _preamble_hash() -> str:
+    """Hash of the static preamble, used to invalidate the warm cache"""
+    with open(PREAMBLE_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _template_hash() -> str:
+    """Hash of every template a PDF is built from, stored with library renders"""
+    digest = hashlib.sha256()
+    for name in ("preamble.tex", "sections.tex", "resume.tex"):
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# The templates only change with a deploy, so hash them once
+_PREAMBLE_HASH = _preamble_hash()
+TEMPLATE_HASH = _template_hash()
+_warm_up_task: Optional[asyncio.Task] = None
+
+
+def is_engine_warm() -> bool:
+    """
+    Check whether the local Tectonic cache holds everything the preamble needs:
+    the marker must match the current preamble and the cache must not be empty.
+    """
+    try:
+        with open(_WARM_MARKER) as f:
+            if f.read().strip() != _PREAMBLE_HASH:
+                return False
+        with os.scandir(TECTONIC_CACHE_DIR) as entries:
+            return any(True for _ in entries)
+    except OSError:
+        return False
+
+
+def _invalidate_warm_cache():
+    """Forget the warm state after an offline compile failed (cache wiped, Tectonic upgraded, ...)"""
     try:
-        subprocess.run([tectonic_path, tex_filename], check=True, capture_output=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error compiling PDF: {e.stderr.decode()}")
-        raise e
-        
-    return output_filename
+        os.remove(_WARM_MARKER)
+    except FileNotFoundError:
+        pass
+
+
+def schedule_warm_up():
+    """Re-warm in the background, at most one warm-up at a time"""
+    global _warm_up_task
+    if _warm_up_task is None or _warm_up_task.done():
+        _warm_up_task = asyncio.create_task(warm_up_engine())
+
+
+def _tectonic_command(tex_path: str, only_cached: Optional[bool] = None, keep_intermediates: bool = False) -> list:
+    """Build the Tectonic command line for compiling a body that inputs the shared preamble"""
+    if only_cached is None:
+        only_cached = is_engine_warm()
+    command = [_tectonic_path(), "-Z", f"search-path={TEMPLATE_DIR}"]
+    if only_cached:
+        command.append("--only-cached")
+    if keep_intermediates:
+        command.append("--keep-intermediates")
+    command.append(tex_path)
+    return command
+
+
+def _tectonic_env() -> dict:
+    """Environment for Tectonic processes, pointing at the local bundle cache"""
+    return {**os.environ, "TECTONIC_CACHE_DIR": TECTONIC_CACHE_DIR}
+
+
+async def warm_up_engine() -> bool:
+    """
+    Compile the static preamble once so every package, font and the format file
+    are cached locally. Safe to call repeatedly; returns True when the engine is warm.
+    """
+    if is_engine_warm():
+        return True
+
+    os.makedirs(TECTONIC_CACHE_DIR, exist_ok=True)
+    scratch_dir = tempfile.mkdtemp(prefix="adaptive_cv_warmup_", dir=RENDER_SCRATCH_DIR)
+    try:
+        tex_path = os.path.join(scratch_dir, "warmup.tex")
+        with open(tex_path, "w") as f:
+            f.write("\\input{preamble.tex}\n\\begin{document}\n\\textbf{\\Huge \\scshape Warm up} \\small{\\textit{warm up}}\n\\end{document}\n")
+
+        started_at = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *_tectonic_command(tex_path, only_cached=False),
+            cwd=scratch_dir,
+            env=_tectonic_env(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            print(f"⚠️ Tectonic warm-up failed: {stderr.decode(errors='replace')}")
+            return False
+
+        with open(_WARM_MARKER, "w") as f:
+            f.write(_PREAMBLE_HASH)
+        print(f"🔥 Tectonic engine warm ({time.perf_counter() - started_at:.1f}s), rendering offline")
+        return True
+    except OSError as e:
+        print(f"⚠️ Tectonic warm-up failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def _fragment(macro: str, *args) -> str:
+    """Render one section macro from sections.tex, reusing the cached LaTeX when its input is unchanged"""
+    global _fragment_hits, _fragment_misses
+    payload = json.dumps(
+        [arg.model_dump(mode="json") if hasattr(arg, "model_dump") else arg for arg in args],
+        sort_keys=True
+    )
+    key = f"{macro}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    fragment = _fragment_cache.get(key)
+    if fragment is not None:
+        _fragment_cache.move_to_end(key)
+        _fragment_hits += 1
+        return fragment
+
+    _fragment_misses += 1
+    fragment = str(getattr(_sections, macro)(*args))
+    _fragment_cache[key] = fragment
+    if len(_fragment_cache) > FRAGMENT_CACHE_SIZE:
+        _fragment_cache.popitem(last=False)
+    return fragment
+
+
+def get_fragment_stats() -> dict:
+    """Get section fragment cache counters"""
+    total = _fragment_hits + _fragment_misses
+    return {
+        "entries": len(_fragment_cache),
+        "max_entries": FRAGMENT_CACHE_SIZE,
+        "hits": _fragment_hits,
+        "misses": _fragment_misses,
+        "hit_rate": round(_fragment_hits / total * 100, 2) if total else 0,
+    }
+
+
+def resolve_logo_path(logo_path: Optional[str]) -> Optional[str]:
+    """
+    Absolute path of a logo inside LOGO_DIR, or None. Only the basename of
+    `logo_path` is used, so client-supplied paths cannot point elsewhere.
+    """
+    if not logo_path:
+        return None
+    name = os.path.basename(logo_path)
+    if not name.lower().endswith(LOGO_EXTENSIONS):
+        return None
+    logo_dir = os.path.realpath(LOGO_DIR)
+    path = os.path.realpath(os.path.join(logo_dir, name))
+    if os.path.dirname(path) != logo_dir or not os.path.isfile(path):
+        return None
+    return path
+
+
+def render_tex(resume: Resume) -> str:
+    """
+    Renders the resume to LaTeX source.
+    Each section is rendered on its own and cached by content hash, so an edit
+    only re-renders (and re-escapes) the sections it touched.
+    Logo paths are resolved inside LOGO_DIR and made absolute so the source
+    compiles from any directory.
+    """
+    logo_path = resolve_logo_path(resume.logo_path)
+
+    fragments = {
+        "heading": _fragment("heading", resume.contact, logo_path),
+        "summary": _fragment("summary", resume.summary) if resume.summary else "",
+        "education": "".join(_fragment("education_item", edu) for edu in resume.education),
+        "experience": "".join(_fragment("experience_item", exp) for exp in resume.experience),
+        "projects": "".join(_fragment("project_item", proj) for proj in resume.projects),
+        "skills": "".join(_fragment("skill_line", skill) for skill in resume.skills),
+        "custom_sections": "".join(_fragment("custom_section", section) for section in resume.custom_sections),
+    }
+    template = latex_jinja_env.get_template("resume.tex")
+    return template.render(fragments=fragments)
+
+
+@lru_cache(maxsize=32)
+def _logo_data_uri(path: str, mtime: float) -> Optional[str]:
+    """Inline a logo image for the HTML preview (cached per file version)"""
+    mime = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+    with open(path, "rb") as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+
+def render_html(resume: Resume) -> str:
+    """
+    Renders the resume as a self-contained HTML page for live previews.
+    Takes milliseconds; Tectonic only runs for the PDF export.
+    """
+    logo_src = None
+    logo_path = resolve_logo_path(resume.logo_path)
+    if logo_path:
+        logo_src = _logo_data_uri(logo_path, os.path.getmtime(logo_path))
+    template = html_jinja_env.get_template("resume.html")
+    return template.render(resume=resume, logo_src=logo_src)
+
+
+def attach_source(pdf_content: bytes, resume: Resume) -> bytes:
+    """
+    Embeds the source Resume as a PDF attachment, so re-uploading a saved
+    library PDF parses exactly and without an LLM call. Only library copies get
+    it: downloads sent to employers stay clean. logo_path (a server path) is
+    never embedded.
+    """
+    doc = fitz.open(stream=pdf_content, filetype="pdf")
+    source = resume.model_dump_json(exclude={"logo_path"}).encode("utf-8")
+    doc.embfile_add(SOURCE_ATTACHMENT, source, filename=SOURCE_ATTACHMENT)
+    return doc.tobytes(deflate=True)
+
+
+class RenderPool:
+    """
+    Bounded pool of concurrent Tectonic compiles.
+    Each job runs in its own scratch directory, so concurrent renders never share files.
+    Renders tagged with an editing session instead reuse that session's work directory
+    (one compile at a time), keeping intermediates such as .aux between edits.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS):
+        self.workers = max(1, workers)
+        self._semaphore = asyncio.Semaphore(self.workers)
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._recent_jobs = deque(maxlen=50)
+        self._session_dirs: "OrderedDict[str, str]" = OrderedDict()
+        self._session_locks: dict = {}
+
+    async def render(self, resume: Resume, session_id: Optional[str] = None) -> bytes:
+        """
+        Render a resume to PDF bytes, waiting for a free worker if needed.
+        `session_id` identifies an editing session whose work directory is reused.
+        """
+        if session_id:
+            async with self._session_locks.setdefault(session_id, asyncio.Lock()):
+                return await self._render(resume, self._session_dir(session_id))
+        return await self._render(resume)
+
+    def _session_dir(self, session_id: str) -> str:
+        """Get (or create) a session's work directory, evicting the least recently used ones"""
+        workdir = self._session_dirs.get(session_id)
+        if workdir is not None and os.path.isdir(workdir):
+            self._session_dirs.move_to_end(session_id)
+            return workdir
+
+        workdir = tempfile.mkdtemp(prefix="adaptive_cv_session_", dir=RENDER_SCRATCH_DIR)
+        self._session_dirs[session_id] = workdir
+        for old_session in list(self._session_dirs)[:-RENDER_SESSION_DIRS]:
+            lock = self._session_locks.get(old_session)
+            if lock is not None and lock.locked():
+                continue
+            shutil.rmtree(self._session_dirs.pop(old_session), ignore_errors=True)
+            self._session_locks.pop(old_session, None)
+        return workdir
+
+    def close(self):
+        """Remove all session work directories"""
+        for workdir in self._session_dirs.values():
+            shutil.rmtree(workdir, ignore_errors=True)
+        self._session_dirs.clear()
+        self._session_locks.clear()
+
+    async def _render(self, resume: Resume, workdir: Optional[str] = None) -> bytes:
+        """Run one compile under the worker limit and record its timings"""
+        job_id = uuid.uuid4().hex[:12]
+        submitted_at = time.perf_counter()
+        started_at = None
+        ok = False
+
+        self._queued += 1
+        try:
+            async with self._semaphore:
+                self._queued -= 1
+                self._active += 1
+                started_at = time.perf_counter()
+                try:
+                    pdf_content = await self._compile(resume, workdir)
+                    ok = True
+                    return pdf_content
+                finally:
+                    self._active -= 1
+        finally:
+            if started_at is None:
+                self._queued -= 1
+                started_at = time.perf_counter()
+            finished_at = time.perf_counter()
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+            self._recent_jobs.append({
+                "job_id": job_id,
+                "ok": ok,
+                "queue_ms": round((started_at - submitted_at) * 1000, 1),
+                "render_ms": round((finished_at - started_at) * 1000, 1),
+            })
+
+    async def _compile(self, resume: Resume, workdir: Optional[str] = None) -> bytes:
+        """Compile a resume in a session work directory, or else an isolated scratch directory"""
+        scratch_dir = workdir or tempfile.mkdtemp(prefix="adaptive_cv_render_", dir=RENDER_SCRATCH_DIR)
+        try:
+            tex_path = os.path.join(scratch_dir, "resume.tex")
+            with open(tex_path, "w") as f:
+                f.write(render_tex(resume))
+
+            only_cached = is_engine_warm()
+            returncode, stderr = await self._tectonic(tex_path, scratch_dir, only_cached, workdir is not None)
+            if returncode != 0 and only_cached:
+                # The local cache no longer has what it needs: compile online once and re-warm
+                print("⚠️ Offline compile failed, retrying with network access and re-warming the cache")
+                _invalidate_warm_cache()
+                returncode, stderr = await self._tectonic(tex_path, scratch_dir, False, workdir is not None)
+                schedule_warm_up()
+
+            if returncode != 0:
+                print(f"Error compiling PDF: {stderr.decode(errors='replace')}")
+                raise RenderError(f"Tectonic exited with code {returncode}")
+
+            with open(os.path.join(scratch_dir, "resume.pdf"), "rb") as f:
+                return f.read()
+        except asyncio.TimeoutError:
+            raise RenderError(f"PDF compilation timed out after {RENDER_TIMEOUT:.0f}s")
+        finally:
+            if workdir is None:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    @staticmethod
+    async def _tectonic(tex_path: str, scratch_dir: str, only_cached: bool, keep_intermediates: bool) -> tuple:
+        """Run one Tectonic compile; returns (exit code, stderr)"""
+        process = await asyncio.create_subprocess_exec(
+            *_tectonic_command(tex_path, only_cached=only_cached, keep_intermediates=keep_intermediates),
+            cwd=scratch_dir,
+            env=_tectonic_env(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=RENDER_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        return process.returncode, stderr
+
+    def get_stats(self) -> dict:
+        """Get queue depth and recent per-job timings"""
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queued,
+            "active": self._active,
+            "completed": self._completed,
+            "failed": self._failed,
+            "session_dirs": len(self._session_dirs),
+            "fragments": get_fragment_stats(),
+            "recent_jobs": list(self._recent_jobs),
+        }
+
+
+# Global render pool instance
+_render_pool: Optional[RenderPool] = None
+
+
+def get_render_pool() -> RenderPool:
+    """Get the global render pool instance"""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = RenderPool()
+    return _render_pool
@@ -0,0 +1,91 @@
+"""
+PNG thumbnails of saved resume PDFs for Adaptive-CV
+Pages are rasterized with PyMuPDF once and stored on disk under the PDF's
+content hash, so renamed or re-saved identical PDFs reuse the same images
+"""
+import hashlib
+import os
+import tempfile
+from typing import Dict, Tuple
+import fitz  # PyMuPDF
+from pdf_text import run_fitz
+
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", "thumbnails")
+# Allowed thumbnail widths in pixels; the first one is the default
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "320,160,640").split(",")]
+DEFAULT_THUMBNAIL_WIDTH = THUMBNAIL_WIDTHS[0]
+
+# (path, mtime, size) -> content hash, so unchanged PDFs are not re-read and re-hashed
+_hash_index: Dict[Tuple[str, float, int], str] = {}
+
+
+class ThumbnailError(Exception):
+    """Raised when a thumbnail cannot be produced (bad width, page or PDF)"""
+
+
+def _content_hash(pdf_path: str) -> str:
+    """SHA-256 prefix of a PDF's content, memoized per file version"""
+    stat = os.stat(pdf_path)
+    version = (os.path.abspath(pdf_path), stat.st_mtime, stat.st_size)
+    content_hash = _hash_index.get(version)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()[:16]
+        _hash_index[version] = content_hash
+    return content_hash
+
+
+def _thumbnail_path(content_hash: str, page: int, width: int) -> str:
+    return os.path.join(THUMBNAIL_DIR, f"{content_hash}_p{page}_w{width}.png")
+
+
+def _rasterize(pdf_path: str, page: int, width: int, out_path: str):
+    """Render one page to PNG at the given pixel width"""
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        raise ThumbnailError(f"Cannot open PDF: {e}")
+    try:
+        if not 0 <= page < doc.page_count:
+            raise ThumbnailError(f"Page {page} out of range (PDF has {doc.page_count} pages)")
+        pdf_page = doc[page]
+        scale = width / pdf_page.rect.width
+        pixmap = pdf_page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        png = pixmap.tobytes("png")
+    finally:
+        doc.close()
+
+    # Write atomically so concurrent requests never read a partial file; the
+    # unique temp name lets two threads render the same thumbnail at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _get_thumbnail(pdf_path: str, page: int, width: int) -> Tuple[str, str]:
+    if width not in THUMBNAIL_WIDTHS:
+        raise ThumbnailError(f"Unsupported width {width}; choose one of {THUMBNAIL_WIDTHS}")
+    content_hash = _content_hash(pdf_path)
+    out_path = _thumbnail_path(content_hash, page, width)
+    if not os.path.exists(out_path):
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        _rasterize(pdf_path, page, width, out_path)
+        print(f"🖼️ Rendered thumbnail {os.path.basename(out_path)}")
+    return out_path, content_hash
+
+
+async def get_thumbnail(pdf_path: str, page: int = 0, width: int = DEFAULT_THUMBNAIL_WIDTH) -> Tuple[str, str]:
+    """
+    Get the PNG thumbnail of a PDF page, rendering it on first use.
+    Returns the PNG path and the PDF's content hash (usable as an ETag).
+    Hashing and rasterizing run on the fitz thread (PyMuPDF is not thread-safe).
+    """
+    return await run_fitz(_get_thumbnail, pdf_path, page, width)
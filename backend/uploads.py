@@ -0,0 +1,73 @@
+"""
+Bounded upload handling for Adaptive-CV
+Oversized requests are rejected from their Content-Length before the body is
+received (see the middleware in main.py). Uploads that get through are hashed
+in place from the temp file Starlette spooled them to, checking the size as
+they are read; the digest is reused for cache keys and storage
+"""
+import hashlib
+import os
+from typing import Optional
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+
+# Size limits (in bytes)
+MAX_RESUME_UPLOAD_BYTES = int(os.getenv("MAX_RESUME_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_LOGO_UPLOAD_BYTES = int(os.getenv("MAX_LOGO_UPLOAD_BYTES", 10 * 1024 * 1024))
+# Resumes longer than this are rejected before any text extraction or LLM call
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", 10))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Allowance for multipart boundaries and form fields when checking Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds its size or page limit"""
+
+
+class InvalidUploadError(Exception):
+    """Raised when an upload cannot be read as the expected file type"""
+
+
+def content_length_exceeds(content_length: Optional[str], max_bytes: int) -> bool:
+    """Whether a multipart request's Content-Length is over an upload limit"""
+    try:
+        return int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES
+    except (TypeError, ValueError):
+        return False  # Missing or chunked: the size is checked while hashing
+
+
+async def hash_upload(upload: UploadFile, max_bytes: int) -> str:
+    """
+    SHA-256 hex digest of an upload, read in chunks from Starlette's temp file
+    (no second copy). Raises UploadTooLargeError past `max_bytes`; the file is
+    rewound afterwards.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"Upload is {upload.size} bytes; the limit is {max_bytes}")
+
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest()
+
+
+def check_pdf_pages(content: bytes, max_pages: Optional[int] = None):
+    """Reject unreadable PDFs and PDFs with more than `max_pages` pages"""
+    max_pages = max_pages or MAX_PDF_PAGES
+    try:
+        doc = fitz.open(stream=content, filetype="pdf")
+    except Exception as e:
+        raise InvalidUploadError(f"Could not read PDF: {e}")
+    try:
+        if doc.page_count > max_pages:
+            raise UploadTooLargeError(f"PDF has {doc.page_count} pages; the limit is {max_pages}")
+    finally:
+        doc.close()
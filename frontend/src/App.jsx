@@ -62,21 +62,28 @@ function App() {
       setChatHistory([{ role: 'assistant', content: "I've analyzed your resume. How can I help you improve it? You can also paste a Job Description here." }]);
       toast.success("Resume uploaded and parsed successfully!");
 
-      // Auto-generate PDF preview
-      const genRes = await fetch('http://localhost:8000/generate', {
+      // Auto-generate a live preview
+      await handlePreview(data);
+    } catch (err) {
+      toast.error(err.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Live preview: HTML rendered by the backend in milliseconds, no LaTeX compile
+  const handlePreview = async (resumeData) => {
+    try {
+      const res = await fetch('http://localhost:8000/preview', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(data),
+        body: JSON.stringify(resumeData),
       });
-      if (genRes.ok) {
-        const blob = await genRes.blob();
-        const url = URL.createObjectURL(blob);
-        setPdfUrl(url);
-      }
+      if (!res.ok) throw new Error('Failed to render preview');
+      const blob = await res.blob();
+      setPdfUrl(URL.createObjectURL(blob));
     } catch (err) {
       toast.error(err.message);
-    } finally {
-      setLoading(false);
     }
   };
 
@@ -188,8 +195,8 @@ function App() {
 
     setResume(newResume);
     toast.success("Resume updated!");
-    // Auto-regenerate PDF with new data
-    handleGenerate(newResume);
+    // Refresh the live preview with new data
+    handlePreview(newResume);
   };
 
   const handleSaveVersion = async () => {
@@ -220,7 +227,7 @@ function App() {
   const handleLoadResume = (data) => {
     setResume(data);
     setViewMode('edit');
-    handleGenerate(data); // Regenerate PDF for the loaded resume
+    handlePreview(data); // Preview the loaded resume
     toast.success("Resume loaded!");
   };
 